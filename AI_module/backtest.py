@@ -0,0 +1,113 @@
+"""Walk-forward бэктест моделей прогноза на истории цен ЦБ.
+
+Все окна по LOOKBACK_DAYS дней строятся одним strided-представлением ряда
+(без копирования), прогоняются через модель большими пачками, а прогноз
+сравнивается с фактическими ценами следующих дней.
+
+    python backtest.py --source http://localhost:8000/api/historical_metals --backend numpy
+    python backtest.py --source history.json --horizon 7 --output backtest.json
+"""
+import argparse
+import json
+import os
+import time
+import urllib.request
+from datetime import datetime
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from model_registry import ModelRegistry, rollout
+
+# Имена металлов в historical_metals_data_cache бэкенда
+METAL_NAMES_RU = {'Золото': 'gold', 'Серебро': 'silver', 'Платина': 'platinum', 'Палладий': 'palladium'}
+
+
+def series_from_history(records):
+    """Список {"date": "дд.мм.гггг", "price": "..."} -> массив цен по возрастанию даты"""
+    rows = [
+        (datetime.strptime(record['date'], '%d.%m.%Y'), float(str(record['price']).replace(',', '.')))
+        for record in records
+        if record.get('price') not in (None, 'N/A')
+    ]
+    rows.sort(key=lambda row: row[0])
+    return np.array([price for _, price in rows], dtype=np.float64)
+
+
+def backtest(entry, prices, lookback, horizon, batch_size=1024):
+    """Ошибки прогноза по каждому шагу горизонта и скорость в окнах в секунду"""
+    prices = np.asarray(prices, dtype=np.float64)
+    if len(prices) < lookback + horizon:
+        raise ValueError(f"Need at least {lookback + horizon} prices, got {len(prices)}")
+
+    # (окна, lookback + horizon): вход и фактические цены - срезы одного представления
+    view = sliding_window_view(prices, lookback + horizon)
+    inputs, targets = view[:, :lookback], view[:, lookback:]
+
+    predictions = np.empty(targets.shape, dtype=np.float64)
+    start = time.perf_counter()
+    for begin in range(0, len(view), batch_size):
+        end = begin + batch_size
+        predictions[begin:end] = rollout(entry.forecast, inputs[begin:end], horizon)
+    elapsed = time.perf_counter() - start
+
+    abs_errors = np.abs(predictions - targets)
+    return {
+        "windows": len(view),
+        "mae": np.round(abs_errors.mean(axis=0), 4).tolist(),
+        "mape_percent": np.round((abs_errors / np.abs(targets)).mean(axis=0) * 100, 4).tolist(),
+        "seconds": round(elapsed, 4),
+        "windows_per_second": round(len(view) / elapsed, 1) if elapsed else None,
+    }
+
+
+def load_history(source):
+    """JSON ответа /api/historical_metals (URL или файл) -> {metal: массив цен}"""
+    if source.startswith(('http://', 'https://')):
+        with urllib.request.urlopen(source, timeout=30) as response:
+            payload = json.load(response)
+    else:
+        with open(source, encoding='utf-8') as f:
+            payload = json.load(f)
+    data = payload.get('data', payload)
+    return {
+        METAL_NAMES_RU.get(name, name): series_from_history(records)
+        for name, records in data.items()
+        if METAL_NAMES_RU.get(name, name) in METAL_NAMES_RU.values()
+    }
+
+
+def main():
+    from metal_forecast_api import BASE_DIR, FORECAST_DAYS, LOOKBACK_DAYS, MODELS_DIR, SUPPORTED_METALS
+
+    parser = argparse.ArgumentParser(description="Walk-forward backtest of the forecast models")
+    parser.add_argument('--source', default='http://localhost:8000/api/historical_metals',
+                        help="URL or JSON file in the /api/historical_metals format")
+    parser.add_argument('--backend', default=os.environ.get('FORECAST_BACKEND', 'keras'))
+    parser.add_argument('--horizon', type=int, default=FORECAST_DAYS)
+    parser.add_argument('--batch-size', type=int, default=1024)
+    parser.add_argument('--output', default=None, help="write the report as JSON")
+    args = parser.parse_args()
+
+    history = load_history(args.source)
+    registry = ModelRegistry(os.path.join(BASE_DIR, MODELS_DIR), SUPPORTED_METALS, LOOKBACK_DAYS, backend=args.backend)
+
+    report = {}
+    for metal, prices in history.items():
+        entry = registry.load(metal)
+        if entry is None:
+            report[metal] = {"error": registry.status()["models"][metal].get("error")}
+            continue
+        try:
+            report[metal] = backtest(entry, prices, LOOKBACK_DAYS, args.horizon, args.batch_size)
+        except ValueError as e:
+            report[metal] = {"error": str(e)}
+        print(metal, json.dumps(report[metal]))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({"backend": args.backend, "horizon": args.horizon, "metals": report}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from metrics import Histogram
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+QUEUE_WAIT_BUCKETS_MS = (0.5, 1, 2, 5, 10, 25, 50, 100, 250, 1000)
+
+
+class _Pending:
+    __slots__ = ("window", "future", "enqueued_at")
+
+    def __init__(self, window):
+        self.window = window
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class MicroBatcher:
+    """Собирает одновременные запросы к одному металлу в один predict.
+
+    Для каждого металла работает отдельный поток: он берет первый запрос из
+    очереди, добирает остальные, пока не наберется max_batch_size или не
+    пройдет max_wait_ms, и раздает строки результата ожидающим Future.
+    """
+
+    def __init__(self, registry, max_batch_size=32, max_wait_ms=5.0):
+        self.registry = registry
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000
+        self.batch_size_hist = Histogram(BATCH_SIZE_BUCKETS)
+        self.queue_wait_hist = Histogram(QUEUE_WAIT_BUCKETS_MS)
+        self._queues = {metal: queue.Queue() for metal in registry.metals}
+        self._threads = []
+
+    def start(self):
+        if self._threads:
+            return
+        for metal, q in self._queues.items():
+            thread = threading.Thread(target=self._run, args=(metal, q), name=f"batcher-{metal}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        for q in self._queues.values():
+            q.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def submit(self, metal, window):
+        """Ставит окно цен (LOOKBACK_DAYS,) в очередь.
+
+        Future получает (прогноз, версия модели, которая его посчитала): между
+        постановкой в очередь и predict модель могла быть перезагружена.
+        """
+        pending = _Pending(window)
+        self._queues[metal].put(pending)
+        return pending.future
+
+    def forecast(self, metal, window, timeout=None):
+        return self.submit(metal, window).result(timeout)
+
+    def _run(self, metal, q):
+        while True:
+            first = q.get()
+            if first is None:
+                return
+            batch = [first]
+            stopping = False
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                try:
+                    item = q.get_nowait()
+                except queue.Empty:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = q.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._process(metal, batch)
+            if stopping:
+                return
+
+    def _process(self, metal, batch):
+        # Запросы, которые уже отменены (клиент ушел), не считаем
+        batch = [pending for pending in batch if pending.future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        now = time.perf_counter()
+        for pending in batch:
+            self.queue_wait_hist.observe((now - pending.enqueued_at) * 1000)
+        self.batch_size_hist.observe(len(batch))
+
+        entry = self.registry.get(metal)
+        try:
+            if entry is None:
+                raise RuntimeError(f"Model for {metal} is not loaded")
+            predictions = entry.forecast(np.stack([pending.window for pending in batch]))
+        except Exception as e:
+            for pending in batch:
+                pending.future.set_exception(e)
+            return
+        for pending, row in zip(batch, predictions):
+            pending.future.set_result((row, entry.version))
+
+    def stats(self):
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "queue_depth": {metal: q.qsize() for metal, q in self._queues.items()},
+            "batch_size": self.batch_size_hist.snapshot(),
+            "queue_wait_ms": self.queue_wait_hist.snapshot(),
+        }
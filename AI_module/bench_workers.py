@@ -0,0 +1,131 @@
+"""Как пропускная способность /forecast зависит от числа процессов serve.py.
+
+Для каждого значения --workers запускает serve.py на отдельном порту,
+ждет готовности моделей и в течение --duration секунд гоняет запросы из
+--clients потоков (keep-alive, случайные окна, чтобы не попадать в кэш).
+
+    python bench_workers.py --workers 1 2 4 --clients 16 --duration 10
+"""
+import argparse
+import http.client
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+LOOKBACK_DAYS = 60
+METALS = ['gold', 'silver', 'platinum', 'palladium']
+
+
+def wait_ready(port, workers, timeout=120):
+    # Соединения раскидываются по процессам ядром, поэтому ждем несколько ответов подряд
+    deadline = time.monotonic() + timeout
+    streak = 0
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            conn.request('GET', '/status')
+            ready = json.loads(conn.getresponse().read()).get('ready')
+            conn.close()
+        except (OSError, ValueError):
+            ready = False
+        streak = streak + 1 if ready else 0
+        if streak >= 4 * workers:
+            return
+        time.sleep(0.1)
+    raise RuntimeError(f"Service on port {port} did not become ready")
+
+
+def run_clients(port, clients, duration, seed):
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def client(index):
+        rng = np.random.default_rng(seed + index)
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        local = []
+        local_errors = 0
+        while time.monotonic() < stop_at:
+            metal = METALS[len(local) % len(METALS)]
+            window = (1000 + np.cumsum(rng.normal(0, 5, LOOKBACK_DAYS))).round(2).tolist()
+            body = json.dumps({'metal': metal, 'prices': window})
+            start = time.perf_counter()
+            try:
+                conn.request('POST', '/forecast', body, {'Content-Type': 'application/json'})
+                response = conn.getresponse()
+                response.read()
+                ok = response.status == 200
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+                ok = False
+            if ok:
+                local.append(time.perf_counter() - start)
+            else:
+                local_errors += 1
+        conn.close()
+        with lock:
+            latencies.extend(local)
+            errors[0] += local_errors
+
+    threads = [threading.Thread(target=client, args=(index,)) for index in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    ms = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    return {
+        "requests": len(latencies),
+        "errors": errors[0],
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(float(np.percentile(ms, 50)), 2),
+        "p99_ms": round(float(np.percentile(ms, 99)), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--threads', type=int, default=1)
+    parser.add_argument('--port', type=int, default=8101)
+    parser.add_argument('--output', default=None, help="write results as JSON")
+    args = parser.parse_args()
+
+    results = []
+    for workers in args.workers:
+        port = args.port + workers
+        server = subprocess.Popen(
+            [sys.executable, 'serve.py', '--workers', str(workers), '--threads', str(args.threads),
+             '--pin', '--port', str(port), '--host', '127.0.0.1'],
+            cwd=BASE_DIR,
+        )
+        try:
+            wait_ready(port, workers)
+            run_clients(port, args.clients, min(2.0, args.duration), seed=1)  # прогрев
+            result = {"workers": workers, **run_clients(port, args.clients, args.duration, seed=1000)}
+        finally:
+            server.terminate()
+            server.wait()
+        results.append(result)
+        print(f"workers={workers:<3} rps={result['throughput_rps']:<9} "
+              f"p50={result['p50_ms']}ms p99={result['p99_ms']}ms errors={result['errors']}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({"cpus": os.cpu_count(), "clients": args.clients, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""Бенчмарк задержек сервиса прогнозов без сети.
+
+Запросы отправляются прямо в ASGI-приложение metal_forecast_api.app, окна
+цен синтетические (случайное блуждание из LOOKBACK_DAYS точек, каждое окно
+новое, чтобы не попадать в кэш). Холодный старт и первый запрос меряются в
+отдельном процессе. Результат пишется в JSON, который можно сравнить с
+прошлым запуском:
+
+    python benchmark.py --output bench_new.json
+    python benchmark.py --output bench_new.json --compare bench_old.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Допустимое ухудшение метрик (доля) относительно прошлого запуска
+REGRESSION_TOLERANCE = 0.10
+
+
+async def asgi_request(app, method, path, body=b'', content_type='application/json'):
+    """Минимальный ASGI-клиент: (статус, тело ответа)"""
+    path, _, query = path.partition('?')
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "root_path": "",
+        "headers": [(b"content-type", content_type.encode()), (b"content-length", str(len(body)).encode())],
+        "client": ("127.0.0.1", 50000),
+        "server": ("127.0.0.1", 8001),
+    }
+    sent = False
+    response = {"status": None, "body": []}
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await asyncio.sleep(3600)
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            response["body"].append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return response["status"], b"".join(response["body"])
+
+
+class WindowFactory:
+    def __init__(self, lookback, seed=0):
+        self.lookback = lookback
+        self.rng = np.random.default_rng(seed)
+
+    def __call__(self, base=1000.0):
+        return (base + np.cumsum(self.rng.normal(0, base * 0.005, self.lookback))).round(2).tolist()
+
+
+def percentiles(samples):
+    ms = np.array(samples) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "mean_ms": round(float(ms.mean()), 3),
+    }
+
+
+async def timed_forecast(app, payload):
+    start = time.perf_counter()
+    status, body = await asgi_request(app, "POST", "/forecast", json.dumps(payload).encode())
+    if status != 200:
+        raise RuntimeError(f"/forecast returned {status}: {body[:200]!r}")
+    return time.perf_counter() - start
+
+
+async def warm_latency(app, metal, windows, requests):
+    samples = [await timed_forecast(app, {"metal": metal, "prices": windows()}) for _ in range(requests)]
+    return {"requests": requests, **percentiles(samples)}
+
+
+async def throughput(app, metal, windows, concurrency, requests):
+    payloads = [{"metal": metal, "prices": windows()} for _ in range(requests)]
+    queue = iter(payloads)
+    samples = []
+
+    async def client():
+        for payload in queue:
+            samples.append(await timed_forecast(app, payload))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {"concurrency": concurrency, "requests": requests,
+            "throughput_rps": round(requests / elapsed, 1), **percentiles(samples)}
+
+
+async def batch_latency(app, metal, windows, batch_size, repeats):
+    samples = []
+    for _ in range(repeats):
+        body = json.dumps({"metal": metal, "windows": [windows() for _ in range(batch_size)]}).encode()
+        start = time.perf_counter()
+        status, response = await asgi_request(app, "POST", "/forecast/batch", body)
+        if status != 200:
+            raise RuntimeError(f"/forecast/batch returned {status}: {response[:200]!r}")
+        samples.append(time.perf_counter() - start)
+    result = {"batch_size": batch_size, **percentiles(samples)}
+    result["windows_per_second"] = round(batch_size / float(np.mean(samples)), 1)
+    return result
+
+
+def cold_start_probe():
+    """Запускается в отдельном процессе: импорт, загрузка моделей и первый запрос"""
+    start = time.perf_counter()
+    import metal_forecast_api as api
+    imported = time.perf_counter()
+    api.load_models()
+    loaded = time.perf_counter()
+    windows = WindowFactory(api.LOOKBACK_DAYS, seed=1)
+    first = asyncio.run(timed_forecast(api.app, {"metal": api.SUPPORTED_METALS[0], "prices": windows()}))
+    api.stop_inference()
+    print(json.dumps({
+        "import_s": round(imported - start, 4),
+        "load_models_s": round(loaded - imported, 4),
+        "cold_start_s": round(loaded - start, 4),
+        "first_request_ms": round(first * 1000, 3),
+    }))
+
+
+def measure_cold_start():
+    output = subprocess.run(
+        [sys.executable, "-W", "ignore", os.path.abspath(__file__), "--cold-start-probe"],
+        cwd=BASE_DIR, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+async def run_suite(api, args):
+    windows = WindowFactory(api.LOOKBACK_DAYS, seed=args.seed)
+    report = {}
+    for metal in args.metals:
+        report[metal] = {
+            "warm_latency": await warm_latency(api.app, metal, windows, args.requests),
+            "throughput": [
+                await throughput(api.app, metal, windows, concurrency, args.requests)
+                for concurrency in args.concurrency
+            ],
+            "batch": [
+                await batch_latency(api.app, metal, windows, batch_size, args.batch_repeats)
+                for batch_size in args.batch_sizes
+            ],
+        }
+        print(f"{metal}: warm p50={report[metal]['warm_latency']['p50_ms']}ms "
+              f"p99={report[metal]['warm_latency']['p99_ms']}ms, "
+              + ", ".join(f"c{t['concurrency']}={t['throughput_rps']}rps" for t in report[metal]["throughput"]))
+    return report
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(new, old):
+    """Печатает изменения ключевых метрик; True, если есть регрессия"""
+    regressed = False
+
+    def check(label, new_value, old_value, higher_is_better=False):
+        nonlocal regressed
+        if not old_value:
+            return
+        ratio = new_value / old_value
+        bad = ratio < 1 - REGRESSION_TOLERANCE if higher_is_better else ratio > 1 + REGRESSION_TOLERANCE
+        regressed = regressed or bad
+        print(f"{'REGRESSION ' if bad else ''}{label}: {old_value} -> {new_value} ({ratio:.2f}x)")
+
+    check("cold_start_s", new["cold_start"]["cold_start_s"], old["cold_start"]["cold_start_s"])
+    check("first_request_ms", new["cold_start"]["first_request_ms"], old["cold_start"]["first_request_ms"])
+    for metal, result in new["metals"].items():
+        previous = old["metals"].get(metal)
+        if not previous:
+            continue
+        for key in ("p95_ms", "p99_ms"):
+            check(f"{metal} warm {key}", result["warm_latency"][key], previous["warm_latency"][key])
+        old_throughput = {t["concurrency"]: t for t in previous["throughput"]}
+        for item in result["throughput"]:
+            if item["concurrency"] in old_throughput:
+                check(f"{metal} c{item['concurrency']} rps", item["throughput_rps"],
+                      old_throughput[item["concurrency"]]["throughput_rps"], higher_is_better=True)
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="In-process latency benchmark for the forecast API")
+    parser.add_argument('--metals', nargs='+', default=None)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16, 64])
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8, 32, 128])
+    parser.add_argument('--batch-repeats', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='benchmark.json')
+    parser.add_argument('--compare', default=None, help="previous benchmark JSON to compare against")
+    parser.add_argument('--cold-start-probe', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.cold_start_probe:
+        cold_start_probe()
+        return
+
+    cold_start = measure_cold_start()
+    print(f"cold start {cold_start['cold_start_s']}s, first request {cold_start['first_request_ms']}ms")
+
+    import metal_forecast_api as api
+    args.metals = args.metals or api.SUPPORTED_METALS
+    api.load_models()
+    try:
+        metals = asyncio.run(run_suite(api, args))
+    finally:
+        api.stop_inference()
+
+    result = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.time(),
+            "backend": api.INFERENCE_BACKEND,
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "cpu_count": os.cpu_count(),
+        },
+        "cold_start": cold_start,
+        "metals": metals,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(result, f, indent=2)
+    print(f"Saved to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            if compare(result, json.load(f)):
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
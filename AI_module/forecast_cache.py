@@ -0,0 +1,71 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+class ForecastCache:
+    """Ограниченный LRU-кэш прогнозов с TTL.
+
+    Ключ - (металл, версия модели, горизонт, хэш окна цен), поэтому после
+    перезагрузки модели старые записи не совпадут с новыми ключами;
+    invalidate() удаляет их сразу, чтобы не занимали место.
+    """
+
+    def __init__(self, max_entries=1024, ttl_seconds=600.0):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = float(ttl_seconds)
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(metal, version, window, horizon):
+        data = np.ascontiguousarray(window, dtype=np.float64).tobytes()
+        return metal, version, horizon, hashlib.blake2b(data, digest_size=16).digest()
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None and item[0] > now:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return item[1]
+            if item is not None:
+                del self._items[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = (time.monotonic() + self.ttl, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, metal=None):
+        with self._lock:
+            if metal is None:
+                self._items.clear()
+                return
+            for key in [key for key in self._items if key[0] == metal]:
+                del self._items[key]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._items),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
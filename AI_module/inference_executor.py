@@ -0,0 +1,94 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+
+class ExecutorBusy(Exception):
+    """Очередь инференса заполнена, запрос нужно повторить позже"""
+
+
+class InferenceExecutor:
+    """Пул потоков для инференса с ограниченной очередью.
+
+    Одновременно принимается не больше workers + queue_size задач; остальные
+    сразу получают ExecutorBusy вместо того, чтобы копиться в очереди и
+    растягивать задержку всех запросов.
+    """
+
+    def __init__(self, workers=8, queue_size=64):
+        self.workers = max(1, int(workers))
+        self.queue_size = max(0, int(queue_size))
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="inference")
+        self._slots = threading.BoundedSemaphore(self.workers + self.queue_size)
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def _acquire(self):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise ExecutorBusy()
+
+    @contextmanager
+    def admit(self):
+        """Место для задачи, которая ждет вне пула потоков (например, шаги в MicroBatcher).
+
+        Делит лимит workers + queue_size с submit(), но поток не занимает:
+        такие задачи ожидают в event loop, а не блокируют воркер.
+        """
+        self._acquire()
+        with self._lock:
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+                self.completed += 1
+            self._slots.release()
+
+    def submit(self, fn, *args):
+        self._acquire()
+        with self._lock:
+            self.queued += 1
+
+        def run():
+            with self._lock:
+                self.queued -= 1
+                self.in_flight += 1
+            try:
+                return fn(*args)
+            finally:
+                with self._lock:
+                    self.in_flight -= 1
+                    self.completed += 1
+                self._slots.release()
+
+        try:
+            return self._pool.submit(run)
+        except RuntimeError:
+            with self._lock:
+                self.queued -= 1
+            self._slots.release()
+            raise
+
+    async def run(self, fn, *args):
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def shutdown(self):
+        self._pool.shutdown(wait=True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queue_size": self.queue_size,
+                "queue_depth": self.queued,
+                "in_flight": self.in_flight,
+                "completed": self.completed,
+                "rejected": self.rejected,
+            }
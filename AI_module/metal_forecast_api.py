@@ -1,11 +1,19 @@
 import uvicorn
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+from fastapi import BackgroundTasks, FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel, ValidationError
+from typing import List, Optional, Union
 import numpy as np
-from tensorflow.keras.models import load_model
-import joblib
+import asyncio
+import hmac
 import os
+import time
 from fastapi.middleware.cors import CORSMiddleware
+from model_registry import ModelRegistry, Rollout, rollout
+from batching import MicroBatcher
+from forecast_cache import ForecastCache
+from inference_executor import ExecutorBusy, InferenceExecutor
+from metrics import CallbackMetric, Counter, LabeledHistogram, RequestMetricsMiddleware, render_metrics
 
 app = FastAPI(title="Metal Forecast API")
 
@@ -22,47 +30,358 @@ FORECAST_DAYS = 3
 LOOKBACK_DAYS = 60
 SUPPORTED_METALS = ['gold', 'silver', 'platinum', 'palladium']
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MAX_BATCH_SIZE = int(os.environ.get("FORECAST_MAX_BATCH_SIZE", 32))
+MAX_BATCH_WAIT_MS = float(os.environ.get("FORECAST_MAX_BATCH_WAIT_MS", 5))
+MAX_BULK_ITEMS = 256
+MAX_HORIZON = 90
+RAW_PRICE_DTYPES = {"float32": np.dtype('<f4'), "float64": np.dtype('<f8')}
+# keras - исходные .h5 через TensorFlow, numpy - те же веса без TensorFlow
+INFERENCE_BACKEND = os.environ.get("FORECAST_BACKEND", "keras")
+# float32 (как в .h5), float16 или int8; сжатые веса поддерживает только numpy-бэкенд
+INFERENCE_PRECISION = os.environ.get("FORECAST_PRECISION", "float32")
+CACHE_MAX_ENTRIES = int(os.environ.get("FORECAST_CACHE_SIZE", 1024))
+CACHE_TTL_SECONDS = float(os.environ.get("FORECAST_CACHE_TTL", 600))
+INFERENCE_WORKERS = int(os.environ.get("FORECAST_WORKERS", 8))
+INFERENCE_QUEUE_SIZE = int(os.environ.get("FORECAST_QUEUE_SIZE", 64))
+RETRY_AFTER_SECONDS = 1
+# Как часто проверять файлы в models/ на замену (секунды, 0 - не проверять)
+MODEL_WATCH_INTERVAL = float(os.environ.get("FORECAST_MODEL_WATCH_INTERVAL", 10))
+# Если задан, POST /admin/reload требует заголовок X-Admin-Token с этим значением;
+# без него перезагрузку можно вызвать только с этой же машины
+ADMIN_TOKEN = os.environ.get("FORECAST_ADMIN_TOKEN")
+LOOPBACK_HOSTS = {"127.0.0.1", "::1", "localhost"}
+
+stage_seconds = LabeledHistogram(
+    "forecast_stage_seconds", "Time spent in each forecast stage (parse, scale, predict, inverse)", ("stage", "metal"))
+http_requests_total = Counter("forecast_http_requests_total", "HTTP requests by path and status", ("path", "status"))
+http_request_seconds = LabeledHistogram("forecast_http_request_seconds", "HTTP request duration", ("path",))
+model_loads_total = Counter("forecast_model_loads_total", "Model load attempts by result", ("metal", "state"))
+
+registry = ModelRegistry(os.path.join(BASE_DIR, MODELS_DIR), SUPPORTED_METALS, LOOKBACK_DAYS,
+                         backend=INFERENCE_BACKEND, precision=INFERENCE_PRECISION,
+                         stage_observer=lambda metal, stage, seconds: stage_seconds.observe(seconds, stage, metal))
+registry.on_load(lambda metal, status: model_loads_total.inc(metal, status["state"]))
+batcher = MicroBatcher(registry, MAX_BATCH_SIZE, MAX_BATCH_WAIT_MS)
+cache = ForecastCache(CACHE_MAX_ENTRIES, CACHE_TTL_SECONDS)
+registry.on_reload(cache.invalidate)
+executor = InferenceExecutor(INFERENCE_WORKERS, INFERENCE_QUEUE_SIZE)
+
+app.add_middleware(
+    RequestMetricsMiddleware,
+    requests_total=http_requests_total,
+    request_seconds=http_request_seconds,
+    paths=["/forecast", "/forecast/batch", "/admin/reload", "/status", "/stats", "/metrics", "/"],
+)
+
+
+def _model_load_seconds():
+    models = registry.status()["models"]
+    return {(metal,): state["load_time_ms"] / 1000 for metal, state in models.items() if "load_time_ms" in state}
+
+
+METRICS = [
+    http_requests_total,
+    http_request_seconds,
+    stage_seconds,
+    model_loads_total,
+    CallbackMetric("forecast_model_load_seconds", "Duration of the last successful model load", "gauge",
+                   ("metal",), _model_load_seconds),
+    CallbackMetric("forecast_executor_queue_depth", "Inference tasks waiting for a worker", "gauge",
+                   (), lambda: {(): executor.queued}),
+    CallbackMetric("forecast_executor_in_flight", "Inference tasks running", "gauge",
+                   (), lambda: {(): executor.in_flight}),
+    CallbackMetric("forecast_executor_rejected_total", "Requests rejected with 503 because the queue was full",
+                   "counter", (), lambda: {(): executor.rejected}),
+    CallbackMetric("forecast_cache_lookups_total", "Forecast cache lookups by result", "counter",
+                   ("result",), lambda: {("hit",): cache.hits, ("miss",): cache.misses}),
+    LabeledHistogram.wrap("forecast_batch_size", "Windows per micro-batch predict", batcher.batch_size_hist),
+    LabeledHistogram.wrap("forecast_batch_queue_wait_milliseconds", "Time a window waited in the micro-batcher",
+                          batcher.queue_wait_hist),
+]
+
+
+@app.on_event("startup")
+def load_models():
+    registry.load_all()
+    batcher.start()
+    registry.start_watcher(MODEL_WATCH_INTERVAL)
+
+
+@app.on_event("shutdown")
+def stop_inference():
+    registry.stop_watcher()
+    executor.shutdown()
+    batcher.stop()
+
+
+# Цены: строка через запятую (старый формат) или JSON-массив чисел
+Prices = Union[str, List[float]]
+
 
 class ForecastRequest(BaseModel):
     metal: str
-    prices: str
+    prices: Prices
+    horizon: int = FORECAST_DAYS
+
 
+class BatchForecastRequest(BaseModel):
+    items: List[ForecastRequest] = []
+    metal: Optional[str] = None
+    windows: List[Prices] = []
+    horizon: int = FORECAST_DAYS
 
-@app.post("/forecast")
-def forecast(req: ForecastRequest):
-    metal = req.metal.lower()
+
+def check_metal(raw_metal):
+    metal = raw_metal.lower()
     if metal not in SUPPORTED_METALS:
         raise HTTPException(status_code=400, detail=f"Unsupported metal: {metal}")
+    return metal
 
-    try:
-        price_list = [float(p.strip().replace(",", ".")) for p in req.prices.split(",")]
-    except ValueError:
-        raise HTTPException(status_code=400, detail="All prices must be valid float numbers separated by commas")
 
-    if len(price_list) != LOOKBACK_DAYS:
+def check_horizon(horizon):
+    if not 1 <= horizon <= MAX_HORIZON:
+        raise HTTPException(status_code=400, detail=f"horizon must be between 1 and {MAX_HORIZON}")
+    return horizon
+
+
+def check_window(window):
+    if window.shape != (LOOKBACK_DAYS,):
         raise HTTPException(status_code=400, detail=f"Exactly {LOOKBACK_DAYS} prices required")
+    if not np.isfinite(window).all():
+        raise HTTPException(status_code=400, detail="All prices must be finite numbers")
+    return window
+
+
+def parse_prices(raw_prices):
+    if isinstance(raw_prices, str):
+        try:
+            price_list = [float(p.strip().replace(",", ".")) for p in raw_prices.split(",")]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="All prices must be valid float numbers separated by commas")
+    else:
+        price_list = raw_prices
+    return check_window(np.array(price_list, dtype=np.float64))
+
+
+def decode_raw_prices(body, dtype_name):
+    """Сырое тело little-endian float32/float64 -> окно цен без копирования"""
+    dtype = RAW_PRICE_DTYPES.get(dtype_name)
+    if dtype is None:
+        raise HTTPException(status_code=400, detail=f"dtype must be one of {', '.join(RAW_PRICE_DTYPES)}")
+    if len(body) != LOOKBACK_DAYS * dtype.itemsize:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Raw body must hold exactly {LOOKBACK_DAYS} {dtype_name} values ({LOOKBACK_DAYS * dtype.itemsize} bytes)",
+        )
+    return check_window(np.frombuffer(memoryview(body), dtype=dtype))
+
+
+def get_entry(metal):
+    entry = registry.get(metal)
+    if entry is None:
+        raise HTTPException(status_code=503, detail=f"Model for {metal} is not loaded yet")
+    return entry
+
+
+def round_forecast(prediction):
+    return [round(p, 2) for p in prediction.tolist()]
 
+
+def queue_full():
+    return HTTPException(
+        status_code=503,
+        detail="Inference queue is full, retry later",
+        headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+    )
+
+
+async def run_inference(fn, *args):
+    """Выполняет fn в пуле инференса; при переполненной очереди сразу 503"""
     try:
-        model_path = os.path.join(BASE_DIR, MODELS_DIR, f"{metal}_model.h5")
-        scaler_path = os.path.join(BASE_DIR, MODELS_DIR, f"{metal}_scaler.pkl")
-        model = load_model(model_path, compile=False)
-        scaler = joblib.load(scaler_path)
+        return await executor.run(fn, *args)
+    except ExecutorBusy:
+        raise queue_full()
+
+
+async def rollout_batched(metal, window, horizon):
+    """Раскатка одного окна через батчер -> (прогноз, версии моделей всех шагов).
+
+    Шаги ждутся в event loop, а не в потоке пула, поэтому в одну пачку
+    батчера попадают все одновременные запросы, вплоть до max_batch_size.
+    """
+    versions = set()
+    state = Rollout(window[np.newaxis], horizon)
+    while not state.done:
+        row, version = await asyncio.wrap_future(batcher.submit(metal, state.windows[0]))
+        versions.add(version)
+        state.add(row[np.newaxis])
+    return state.result()[0], versions
+
+
+async def run_forecast(metal, window, horizon):
+    # Место в лимите очереди берется без потока: шаги раскатки ждут батчер асинхронно
+    try:
+        with executor.admit():
+            prediction, versions = await rollout_batched(metal, window, horizon)
+            if len(versions) > 1:
+                # Модель подменили посреди раскатки: пересчитываем, чтобы все шаги дала одна версия
+                prediction, versions = await rollout_batched(metal, window, horizon)
+    except ExecutorBusy:
+        raise queue_full()
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error loading model/scaler for {metal}: {e}")
+        raise HTTPException(status_code=500, detail=f"Error running model for {metal}: {e}")
+
+    result = round_forecast(prediction)
+    version = versions.pop()
+    cache.put(cache.key(metal, version, window, horizon), tuple(result))
+    return {"forecast": result, "model_version": version}
+
+
+def run_batch_forecast(missing):
+    """missing: {metal: (entry, [(index, window, horizon, cache_key), ...])} -> {index: прогноз}
+
+    Вся пачка металла считается одной версией модели - той, что в entry.
+    """
+    results = {}
+    for metal, (entry, rows) in missing.items():
+        # Одна раскатка на металл до самого длинного горизонта, дальше срезы
+        horizon = max(row[2] for row in rows)
+        try:
+            predictions = rollout(entry.forecast, np.stack([row[1] for row in rows]), horizon)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error running model for {metal}: {e}")
+        for (index, _, row_horizon, cache_key), prediction in zip(rows, predictions):
+            result = round_forecast(prediction[:row_horizon])
+            cache.put(cache_key, tuple(result))
+            results[index] = result
+    return results
+
+
+@app.post("/forecast", openapi_extra={
+    "requestBody": {
+        "required": True,
+        "content": {
+            "application/json": {"schema": ForecastRequest.model_json_schema()},
+            "application/octet-stream": {
+                "schema": {"type": "string", "format": "binary"},
+                "description": f"{LOOKBACK_DAYS} little-endian floats; metal, dtype (float32/float64) "
+                               "and horizon in the query string",
+            },
+        },
+    },
+})
+async def forecast(request: Request):
+    body = await request.body()
+    parse_start = time.perf_counter()
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type == "application/octet-stream":
+        metal = check_metal(request.query_params.get("metal", ""))
+        window = decode_raw_prices(body, request.query_params.get("dtype", "float64"))
+        try:
+            horizon = int(request.query_params.get("horizon", FORECAST_DAYS))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="horizon must be an integer")
+    else:
+        try:
+            req = ForecastRequest.model_validate_json(body)
+        except ValidationError as e:
+            raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_input=False))
+        metal = check_metal(req.metal)
+        window = parse_prices(req.prices)
+        horizon = req.horizon
+    check_horizon(horizon)
+    stage_seconds.observe(time.perf_counter() - parse_start, "parse", metal)
+
+    # Попадания в кэш отдаем сразу, не занимая место в очереди инференса
+    entry = get_entry(metal)
+    cache_key = cache.key(metal, entry.version, window, horizon)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return {"forecast": list(cached), "model_version": entry.version}
+
+    return await run_forecast(metal, window, horizon)
+
+
+@app.post("/forecast/batch")
+async def forecast_batch(req: BatchForecastRequest):
+    # Либо список пар {metal, prices}, либо несколько окон для одного металла
+    items = [(item.metal, item.prices, item.horizon) for item in req.items]
+    if req.windows:
+        if not req.metal:
+            raise HTTPException(status_code=400, detail="'metal' is required together with 'windows'")
+        items += [(req.metal, window, req.horizon) for window in req.windows]
+    if not items:
+        raise HTTPException(status_code=400, detail="Nothing to forecast: pass 'items' or 'metal' with 'windows'")
+    if len(items) > MAX_BULK_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_ITEMS} windows per request")
+
+    by_metal = {}
+    for index, (raw_metal, raw_prices, horizon) in enumerate(items):
+        parse_start = time.perf_counter()
+        metal = check_metal(raw_metal)
+        by_metal.setdefault(metal, []).append((index, parse_prices(raw_prices), check_horizon(horizon)))
+        stage_seconds.observe(time.perf_counter() - parse_start, "parse", metal)
+
+    forecasts = [None] * len(items)
+    missing = {}
+    for metal, rows in by_metal.items():
+        entry = get_entry(metal)
+        for index, window, horizon in rows:
+            cache_key = cache.key(metal, entry.version, window, horizon)
+            cached = cache.get(cache_key)
+            if cached is not None:
+                forecasts[index] = {"metal": metal, "forecast": list(cached), "model_version": entry.version}
+            else:
+                missing.setdefault(metal, (entry, []))[1].append((index, window, horizon, cache_key))
+
+    if missing:
+        results = await run_inference(run_batch_forecast, missing)
+        for metal, (entry, rows) in missing.items():
+            for index, *_ in rows:
+                forecasts[index] = {"metal": metal, "forecast": results[index], "model_version": entry.version}
+
+    return {"forecasts": forecasts}
+
+
+@app.post("/admin/reload", status_code=202)
+def admin_reload(background_tasks: BackgroundTasks, request: Request, metal: Optional[str] = None, force: bool = False):
+    """Перечитывает модели из models/ в фоне; ответ приходит сразу, итог виден в /status"""
+    if ADMIN_TOKEN:
+        if not hmac.compare_digest(request.headers.get("x-admin-token", ""), ADMIN_TOKEN):
+            raise HTTPException(status_code=403, detail="Invalid admin token")
+    elif request.client is None or request.client.host not in LOOPBACK_HOSTS:
+        raise HTTPException(status_code=403, detail="Reload is allowed only from localhost unless FORECAST_ADMIN_TOKEN is set")
+    metals = [check_metal(metal)] if metal else SUPPORTED_METALS
+    for name in metals:
+        background_tasks.add_task(registry.reload, name, force)
+    return {"reloading": metals, "versions": {name: getattr(registry.get(name), "version", None) for name in metals}}
+
+
+@app.get("/status")
+def status():
+    return registry.status()
+
+
+@app.get("/stats")
+def stats():
+    return {"executor": executor.stats(), "batching": batcher.stats(), "cache": cache.stats()}
 
-    input_array = np.array(price_list).reshape(-1, 1)
-    scaled_input = scaler.transform(input_array)
-    X = scaled_input.reshape((1, LOOKBACK_DAYS, 1))
-    scaled_pred = model.predict(X)[0]
-    prediction = scaler.inverse_transform(scaled_pred.reshape(-1, 1)).flatten()
 
-    return {"forecast": [round(p, 2) for p in prediction.tolist()]}
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(render_metrics(METRICS), media_type="text/plain; version=0.0.4")
 
 
 @app.get("/")
 def root():
     return {
-        "message": "POST /forecast with {'metal': 'gold', 'prices': '1234.5,1236.1,...'}"
+        "message": "POST /forecast with {'metal': 'gold', 'prices': '1234.5,1236.1,...'} "
+                   "or {'metal': 'gold', 'prices': [1234.5, 1236.1, ...], 'horizon': 7}",
+        "raw": "POST /forecast?metal=gold&dtype=float32 with Content-Type: application/octet-stream "
+               f"and {LOOKBACK_DAYS} little-endian floats as the body",
+        "batch": "POST /forecast/batch with {'items': [{'metal': 'gold', 'prices': '...'}, ...]} "
+                 "or {'metal': 'gold', 'windows': ['...', '...']}",
+        "reload": "POST /admin/reload?metal=gold reloads changed model files without a restart",
     }
 
 
@@ -0,0 +1,179 @@
+import bisect
+import threading
+import time
+
+# Границы корзин для задержек в секундах
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+
+class Histogram:
+    """Потокобезопасная гистограмма с фиксированными границами корзин"""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    def cumulative(self):
+        """([(граница, накопленное число)...], сумма, количество)"""
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+        running = 0
+        buckets = []
+        for bound, value in zip(self.buckets, counts):
+            running += value
+            buckets.append((bound, running))
+        return buckets, total, count
+
+    def snapshot(self):
+        """Накопительные счетчики по корзинам, как в Prometheus"""
+        buckets, total, count = self.cumulative()
+        cumulative = {str(bound): value for bound, value in buckets}
+        cumulative["+Inf"] = count
+        return {
+            "buckets": cumulative,
+            "count": count,
+            "sum": round(total, 6),
+            "mean": round(total / count, 6) if count else 0.0,
+        }
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class LabeledHistogram:
+    """Набор гистограмм с метками для /metrics"""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, label_names=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = buckets
+        self._children = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def wrap(cls, name, help_text, histogram):
+        """Показывает в /metrics уже существующую гистограмму без меток"""
+        metric = cls(name, help_text, buckets=histogram.buckets)
+        metric._children[()] = histogram
+        return metric
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, Histogram(self.buckets))
+        return child
+
+    def observe(self, value, *values):
+        self.labels(*values).observe(value)
+
+    def render(self):
+        lines = []
+        for values, histogram in sorted(self._children.items()):
+            buckets, total, count = histogram.cumulative()
+            for bound, cumulative in buckets:
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, values, ('le', bound))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.label_names, values, ('le', '+Inf'))} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, values)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, values)} {count}")
+        return lines
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *values, amount=1):
+        with self._lock:
+            self._values[values] = self._values.get(values, 0) + amount
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.label_names, values)} {value}" for values, value in items]
+
+
+class CallbackMetric:
+    """Значения считываются в момент запроса /metrics: fn() -> {кортеж меток: число}"""
+
+    def __init__(self, name, help_text, kind, label_names, fn):
+        self.name = name
+        self.help = help_text
+        self.kind = kind
+        self.label_names = tuple(label_names)
+        self.fn = fn
+
+    def render(self):
+        return [f"{self.name}{_format_labels(self.label_names, values)} {value}"
+                for values, value in sorted(self.fn().items())]
+
+
+def render_metrics(metrics):
+    """Текстовый формат Prometheus 0.0.4"""
+    lines = []
+    for metric in metrics:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class RequestMetricsMiddleware:
+    """ASGI-middleware: число запросов по пути и статусу и их длительность.
+
+    Написано без BaseHTTPMiddleware, чтобы не добавлять лишнюю задачу и
+    копирование тела на каждый запрос.
+    """
+
+    def __init__(self, app, requests_total, request_seconds, paths):
+        self.app = app
+        self.requests_total = requests_total
+        self.request_seconds = request_seconds
+        self.paths = frozenset(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"] if scope["path"] in self.paths else "other"
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.request_seconds.observe(time.perf_counter() - start, path)
+            self.requests_total.inc(path, str(status[0]))
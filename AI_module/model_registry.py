@@ -0,0 +1,313 @@
+import hashlib
+import os
+import threading
+import time
+
+import numpy as np
+
+SUPPORTED_BACKENDS = ('keras', 'numpy')
+
+
+def file_version(*paths):
+    """Короткий хэш содержимого файлов модели и скейлера"""
+    digest = hashlib.sha1()
+    for path in paths:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+
+class Rollout:
+    """Состояние авторегрессионного прогноза на horizon дней для пачки окон.
+
+    windows - окна (N, lookback) для следующего predict; add() принимает его
+    результат (N, steps), дописывает прогноз в конец окон и отбрасывает самые
+    старые цены. Сам predict вызывает владелец, поэтому шаги можно и ждать
+    асинхронно.
+    """
+
+    def __init__(self, windows, horizon):
+        self.windows = np.asarray(windows, dtype=np.float64)
+        self.horizon = horizon
+        self._outputs = []
+        self._produced = 0
+
+    @property
+    def done(self):
+        return bool(self._outputs) and self._produced >= self.horizon
+
+    def add(self, steps):
+        self._outputs.append(steps)
+        self._produced += steps.shape[1]
+        lookback = self.windows.shape[1]
+        self.windows = np.concatenate([self.windows, steps], axis=1)[:, -lookback:]
+
+    def result(self):
+        return np.concatenate(self._outputs, axis=1)[:, :self.horizon]
+
+
+def rollout(predict, windows, horizon):
+    """Авторегрессионный прогноз на horizon дней сразу для всех окон.
+
+    predict: (N, lookback) -> (N, steps). Каждый шаг - один predict на всю пачку.
+    """
+    state = Rollout(windows, horizon)
+    while not state.done:
+        state.add(predict(state.windows))
+    return state.result()
+
+
+class LoadedModel:
+    """Модель и скейлер одного металла, уже загруженные в память"""
+
+    def __init__(self, metal, model, scaler, version, load_time, price_range):
+        self.metal = metal
+        self.model = model
+        # None означает, что скейлер уже встроен в веса модели
+        self.scaler = scaler
+        self.price_range = price_range
+        self.version = version
+        self.load_time = load_time
+        self.loaded_at = time.time()
+        # mtime файлов модели и скейлера на момент загрузки
+        self.mtimes = None
+        # stage_observer(metal, stage, seconds) получает время scale/predict/inverse
+        self.stage_observer = None
+
+    def forecast(self, windows):
+        """Прогноз для пачки окон цен формы (N, lookback) -> (N, FORECAST_DAYS)"""
+        windows = np.asarray(windows, dtype=np.float64)
+        n, lookback = windows.shape
+        observe = self.stage_observer
+        if self.scaler is None:
+            start = time.perf_counter()
+            prediction = np.asarray(self.model.predict_on_batch(windows.reshape(n, lookback, 1)), dtype=np.float64)
+            if observe:
+                observe(self.metal, "predict", time.perf_counter() - start)
+            return prediction
+
+        start = time.perf_counter()
+        scaled = self.scaler.transform(windows.reshape(-1, 1)).reshape(n, lookback, 1)
+        scaled_at = time.perf_counter()
+        scaled_pred = np.asarray(self.model.predict_on_batch(scaled))
+        predicted_at = time.perf_counter()
+        prediction = self.scaler.inverse_transform(scaled_pred.reshape(-1, 1)).reshape(n, -1)
+        if observe:
+            observe(self.metal, "scale", scaled_at - start)
+            observe(self.metal, "predict", predicted_at - scaled_at)
+            observe(self.metal, "inverse", time.perf_counter() - predicted_at)
+        return prediction
+
+
+class ModelRegistry:
+    """Загружает модели всех металлов один раз и раздает их из памяти"""
+
+    def __init__(self, models_dir, metals, lookback_days, backend='keras', stage_observer=None, precision='float32'):
+        if backend not in SUPPORTED_BACKENDS:
+            raise ValueError(f"Unknown inference backend: {backend}")
+        if precision != 'float32':
+            from numpy_runtime import PRECISIONS
+            if precision not in PRECISIONS:
+                raise ValueError(f"Unknown precision: {precision}")
+            if backend != 'numpy':
+                raise ValueError(f"Precision {precision} is only supported by the numpy backend")
+        self.models_dir = models_dir
+        self.metals = list(metals)
+        self.lookback_days = lookback_days
+        self.backend = backend
+        self.precision = precision
+        self.stage_observer = stage_observer
+        self._entries = {}
+        self._status = {metal: {"state": "pending"} for metal in self.metals}
+        self._lock = threading.Lock()
+        # Загрузки одного металла идут строго по очереди: вотчер и ручной reload не пересекаются
+        self._load_locks = {metal: threading.Lock() for metal in self.metals}
+        self._reload_listeners = []
+        self._load_listeners = []
+        # mtime файлов, замеченные вотчером, но еще не проверенные на стабильность,
+        # и mtime, с которыми уже пробовали перезагрузиться (чтобы не грузить битый файл по кругу)
+        self._pending_mtimes = {}
+        self._attempted_mtimes = {}
+        self._watcher = None
+        self._watcher_stop = threading.Event()
+
+    def on_reload(self, callback):
+        """callback(metal) вызывается, когда уже загруженная модель заменена новой"""
+        self._reload_listeners.append(callback)
+
+    def on_load(self, callback):
+        """callback(metal, status) вызывается после каждой попытки загрузки"""
+        self._load_listeners.append(callback)
+
+    def _notify_load(self, metal, state):
+        with self._lock:
+            status = dict(self._status[metal], state=state)
+        for callback in self._load_listeners:
+            callback(metal, status)
+
+    def paths(self, metal):
+        return (
+            os.path.join(self.models_dir, f"{metal}_model.h5"),
+            os.path.join(self.models_dir, f"{metal}_scaler.pkl"),
+        )
+
+    def file_mtimes(self, metal):
+        return tuple(os.stat(path).st_mtime_ns for path in self.paths(metal))
+
+    def load_all(self):
+        for metal in self.metals:
+            self.load(metal)
+
+    def load(self, metal):
+        """Загружает и прогревает модель, затем подменяет ее одним присваиванием.
+
+        Пока идет загрузка, запросы обслуживает прежняя модель; если загрузка
+        не удалась, прежняя модель остается активной.
+        """
+        with self._load_locks[metal]:
+            return self._load(metal)
+
+    def reload(self, metal, force=False):
+        """Перезагружает модель, если содержимое файлов изменилось (или force).
+
+        Возвращает True, если активная модель заменена.
+        """
+        with self._load_locks[metal]:
+            entry = self._entries.get(metal)
+            if entry is not None and not force:
+                try:
+                    mtimes = self.file_mtimes(metal)
+                    version = file_version(*self.paths(metal))
+                except OSError:
+                    return False
+                if version == entry.version:
+                    # Файлы перезаписаны тем же содержимым: запоминаем mtime, чтобы не хэшировать снова
+                    entry.mtimes = mtimes
+                    return False
+            new_entry = self._load(metal)
+            return new_entry is not None and new_entry is not entry
+
+    def _load(self, metal):
+        previous = self._entries.get(metal)
+        with self._lock:
+            if previous is None:
+                self._status[metal] = {"state": "loading"}
+            else:
+                self._status[metal]["reloading"] = True
+        start = time.perf_counter()
+        try:
+            model_path, scaler_path = self.paths(metal)
+            # mtime снимаем до чтения: если файл поменяется во время загрузки, вотчер это заметит
+            mtimes = self.file_mtimes(metal)
+            version = file_version(model_path, scaler_path)
+            model, scaler, price_range = self._load_model(model_path, scaler_path, version)
+            entry = LoadedModel(metal, model, scaler, version, 0.0, price_range)
+            entry.mtimes = mtimes
+            warmup_time = self._warm_up(entry)
+        except Exception as e:
+            with self._lock:
+                if previous is None:
+                    self._status[metal] = {"state": "error", "error": str(e)}
+                else:
+                    self._status[metal].pop("reloading", None)
+                    self._status[metal]["reload_error"] = str(e)
+            self._notify_load(metal, "error")
+            return None
+
+        entry.load_time = time.perf_counter() - start
+        # Подключаем наблюдатель только после прогрева, чтобы он не попал в метрики
+        entry.stage_observer = self.stage_observer
+        with self._lock:
+            previous = self._entries.get(metal)
+            self._entries[metal] = entry
+            self._status[metal] = {
+                "state": "ready",
+                "version": entry.version,
+                "load_time_ms": round(entry.load_time * 1000, 1),
+                "warmup_time_ms": round(warmup_time * 1000, 1),
+                "loaded_at": entry.loaded_at,
+            }
+        self._notify_load(metal, "ready")
+        if previous is not None:
+            for callback in self._reload_listeners:
+                callback(metal)
+        return entry
+
+    def _load_model(self, model_path, scaler_path, version):
+        if self.backend == 'numpy':
+            from numpy_runtime import load_folded_model
+            model, price_range = load_folded_model(model_path, scaler_path, version, self.precision)
+            return model, None, price_range
+        # TensorFlow и sklearn импортируем только для keras-бэкенда: сам импорт занимает секунды
+        import joblib
+        from tensorflow.keras.models import load_model
+        scaler = joblib.load(scaler_path)
+        price_range = (float(scaler.data_min_[0]), float(scaler.data_max_[0]))
+        return load_model(model_path, compile=False), scaler, price_range
+
+    def _warm_up(self, entry):
+        # Первый predict строит граф TensorFlow, поэтому делаем его до первого запроса
+        mid_price = sum(entry.price_range) / 2
+        start = time.perf_counter()
+        entry.forecast(np.full((1, self.lookback_days), mid_price))
+        return time.perf_counter() - start
+
+    def start_watcher(self, interval):
+        """Фоновая проверка файлов моделей каждые interval секунд"""
+        if self._watcher is not None or interval <= 0:
+            return
+        self._watcher_stop.clear()
+        self._watcher = threading.Thread(target=self._watch, args=(interval,), name="model-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self):
+        if self._watcher is None:
+            return
+        self._watcher_stop.set()
+        self._watcher.join()
+        self._watcher = None
+
+    def _watch(self, interval):
+        while not self._watcher_stop.wait(interval):
+            self.check_files()
+
+    def check_files(self):
+        """Перезагружает модели, файлы которых изменились с прошлой загрузки.
+
+        Новые mtime должны продержаться одну проверку без изменений: так мы не
+        читаем .h5, который еще копируется, и не берем новую модель со старым
+        скейлером, пока второй файл не дописан.
+        """
+        for metal in self.metals:
+            try:
+                mtimes = self.file_mtimes(metal)
+            except OSError:
+                self._pending_mtimes.pop(metal, None)
+                continue
+            entry = self._entries.get(metal)
+            if (entry is not None and mtimes == entry.mtimes) or mtimes == self._attempted_mtimes.get(metal):
+                self._pending_mtimes.pop(metal, None)
+                continue
+            if self._pending_mtimes.get(metal) != mtimes:
+                self._pending_mtimes[metal] = mtimes
+                continue
+            del self._pending_mtimes[metal]
+            self._attempted_mtimes[metal] = mtimes
+            self.reload(metal)
+
+    def get(self, metal):
+        """Возвращает загруженную модель или None, если она еще не готова"""
+        return self._entries.get(metal)
+
+    def is_ready(self):
+        return all(metal in self._entries for metal in self.metals)
+
+    def status(self):
+        with self._lock:
+            return {
+                "ready": self.is_ready(),
+                "backend": self.backend,
+                "precision": self.precision,
+                "models": {metal: dict(state) for metal, state in self._status.items()},
+            }
@@ -0,0 +1,303 @@
+import json
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+# Допустимое относительное расхождение прогноза NumPy и Keras
+PARITY_RTOL = 1e-4
+# Скомпилированные веса (со встроенным скейлером) лежат рядом с .h5
+COMPILED_SUFFIX = '_numpy.npz'
+# Точность хранения матриц весов: float16 - половинные числа, int8 - целые со шкалой на каждый выход
+PRECISIONS = ('float32', 'float16', 'int8')
+# Матрицы весов, которые сжимаются; bias и шкалы всегда float32
+QUANTIZED_WEIGHTS = ('kernel', 'recurrent_kernel')
+
+
+def _sigmoid(x):
+    # Через tanh, чтобы не было переполнения exp на больших |x|
+    return 0.5 * (np.tanh(0.5 * x) + 1.0)
+
+
+def _read_weights(group):
+    """Собирает датасеты слоя по именам (kernel, recurrent_kernel, bias)"""
+    import h5py
+
+    weights = {}
+
+    def visit(name, obj):
+        if isinstance(obj, h5py.Dataset):
+            weights[name.split('/')[-1].split(':')[0]] = np.array(obj, dtype=np.float32)
+
+    group.visititems(visit)
+    return weights
+
+
+class NumpyLSTMModel:
+    """Прямой проход Sequential(LSTM..., Dense) из .h5 на векторизованном NumPy.
+
+    Поддерживает ровно ту архитектуру, что лежит в models/: стопка LSTM
+    (tanh/sigmoid), Dropout (в инференсе ничего не делает) и Dense на выходе.
+    """
+
+    def __init__(self, layers, precision='float32'):
+        self.layers = layers
+        self.precision = precision
+
+    @property
+    def nbytes(self):
+        """Сколько памяти занимают веса"""
+        return sum(value.nbytes for layer in self.layers for value in layer.values() if isinstance(value, np.ndarray))
+
+    def quantize(self, precision):
+        """Копия модели, у которой матрицы весов хранятся в float16 или int8.
+
+        int8 - симметричная квантизация по столбцам: w = q * scale, scale =
+        max|w| / 127 для каждого выхода. Веса разжимаются обратно во float32
+        при каждом predict_on_batch, поэтому в памяти постоянно лежит только
+        сжатая копия.
+        """
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown precision: {precision}")
+        if precision == 'float32':
+            return self
+        layers = []
+        for layer in self.layers:
+            layer = dict(layer)
+            for name in QUANTIZED_WEIGHTS:
+                if name not in layer:
+                    continue
+                weight = layer[name].astype(np.float32)
+                if precision == 'float16':
+                    layer[name] = weight.astype(np.float16)
+                    continue
+                scale = np.abs(weight).max(axis=0) / 127
+                scale[scale == 0] = 1.0
+                layer[name] = np.round(weight / scale).astype(np.int8)
+                layer[f"{name}_scale"] = scale.astype(np.float32)
+            layers.append(layer)
+        return NumpyLSTMModel(layers, precision)
+
+    @staticmethod
+    def _weight(layer, name):
+        """Матрица весов во float32: для сжатых моделей разжимается на лету"""
+        weight = layer[name]
+        if weight.dtype == np.float32:
+            return weight
+        weight = weight.astype(np.float32)
+        scale = layer.get(f"{name}_scale")
+        if scale is not None:
+            weight *= scale
+        return weight
+
+    @classmethod
+    def from_h5(cls, path):
+        import h5py
+
+        layers = []
+        with h5py.File(path, 'r') as f:
+            config = json.loads(f.attrs['model_config'])
+            weights_root = f['model_weights'] if 'model_weights' in f else f
+            for layer in config['config']['layers']:
+                kind, layer_config = layer['class_name'], layer['config']
+                if kind in ('InputLayer', 'Dropout'):
+                    continue
+                weights = _read_weights(weights_root[layer_config['name']])
+                if kind == 'LSTM':
+                    if layer_config.get('activation') != 'tanh' or layer_config.get('recurrent_activation') != 'sigmoid':
+                        raise ValueError(f"Unsupported LSTM activations in {path}")
+                    layers.append({
+                        "kind": "lstm",
+                        "kernel": weights['kernel'],
+                        "recurrent_kernel": weights['recurrent_kernel'],
+                        "bias": weights.get('bias', np.zeros(weights['kernel'].shape[1], np.float32)),
+                        "return_sequences": bool(layer_config.get('return_sequences')),
+                    })
+                elif kind == 'Dense':
+                    if layer_config.get('activation', 'linear') != 'linear':
+                        raise ValueError(f"Unsupported Dense activation in {path}")
+                    layers.append({
+                        "kind": "dense",
+                        "kernel": weights['kernel'],
+                        "bias": weights.get('bias', np.zeros(weights['kernel'].shape[1], np.float32)),
+                    })
+                else:
+                    raise ValueError(f"Unsupported layer {kind} in {path}")
+        if not layers or layers[0]["kind"] != "lstm" or layers[-1]["kind"] != "dense":
+            raise ValueError(f"Expected LSTM input and Dense output layers in {path}")
+        return cls(layers)
+
+    def fold_scaler(self, scaler):
+        """Встраивает MinMaxScaler в первый и последний слой.
+
+        transform: x * scale + min, поэтому kernel первого LSTM умножается на
+        scale, а к bias добавляется min @ kernel. inverse_transform:
+        (y - min) / scale, поэтому Dense делится на scale. После этого модель
+        принимает и возвращает цены в рублях.
+        """
+        scale = np.float64(scaler.scale_[0])
+        offset = np.float64(scaler.min_[0])
+        layers = [dict(layer) for layer in self.layers]
+
+        first, last = layers[0], layers[-1]
+        kernel = first["kernel"].astype(np.float64)
+        first["bias"] = (first["bias"] + offset * kernel.sum(axis=0)).astype(np.float32)
+        first["kernel"] = (kernel * scale).astype(np.float32)
+        last["kernel"] = (last["kernel"].astype(np.float64) / scale).astype(np.float32)
+        last["bias"] = ((last["bias"].astype(np.float64) - offset) / scale).astype(np.float32)
+        return NumpyLSTMModel(layers)
+
+    @classmethod
+    def _lstm(cls, x, layer):
+        n, steps, _ = x.shape
+        # Разжимаем один раз на вызов, а не на каждом шаге по времени
+        recurrent_kernel = cls._weight(layer, "recurrent_kernel")
+        units = recurrent_kernel.shape[0]
+        # Входную часть считаем сразу для всех шагов одним matmul
+        x_proj = x @ cls._weight(layer, "kernel") + layer["bias"]
+        h = np.zeros((n, units), dtype=np.float32)
+        c = np.zeros((n, units), dtype=np.float32)
+        outputs = np.empty((n, steps, units), dtype=np.float32) if layer["return_sequences"] else None
+        for t in range(steps):
+            z = x_proj[:, t] + h @ recurrent_kernel
+            i = _sigmoid(z[:, :units])
+            f = _sigmoid(z[:, units:2 * units])
+            g = np.tanh(z[:, 2 * units:3 * units])
+            o = _sigmoid(z[:, 3 * units:])
+            c = f * c + i * g
+            h = o * np.tanh(c)
+            if outputs is not None:
+                outputs[:, t] = h
+        return outputs if outputs is not None else h
+
+    def predict_on_batch(self, X):
+        """X формы (N, steps, 1) -> (N, outputs), как у Keras"""
+        x = np.asarray(X, dtype=np.float32)
+        for layer in self.layers:
+            if layer["kind"] == "lstm":
+                x = self._lstm(x, layer)
+            else:
+                x = x @ self._weight(layer, "kernel") + layer["bias"]
+        return x
+
+
+def _compiled_path(model_path):
+    return os.path.splitext(model_path)[0] + COMPILED_SUFFIX
+
+
+def _write_compiled(path, model, version, price_range):
+    arrays = {
+        "version": np.array(version),
+        "price_range": np.array(price_range, dtype=np.float64),
+        "kinds": np.array([layer["kind"] for layer in model.layers]),
+        "return_sequences": np.array([layer.get("return_sequences", False) for layer in model.layers]),
+    }
+    for index, layer in enumerate(model.layers):
+        for key, value in layer.items():
+            if isinstance(value, np.ndarray):
+                arrays[f"layer{index}_{key}"] = value
+    # Свой временный файл у каждого процесса: воркеры и наблюдатель перезагрузки
+    # пишут кэш одновременно, а os.replace атомарно подменяет готовый файл
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _read_compiled(path, version):
+    if not os.path.exists(path):
+        return None
+    with np.load(path, allow_pickle=False) as data:
+        if str(data["version"]) != version:
+            return None
+        layers = []
+        for index, (kind, return_sequences) in enumerate(zip(data["kinds"], data["return_sequences"])):
+            prefix = f"layer{index}_"
+            layer = {key[len(prefix):]: data[key] for key in data.files if key.startswith(prefix)}
+            layer["kind"] = str(kind)
+            if kind == "lstm":
+                layer["return_sequences"] = bool(return_sequences)
+            layers.append(layer)
+        return NumpyLSTMModel(layers), tuple(data["price_range"].tolist())
+
+
+def load_folded_model(model_path, scaler_path, version, precision='float32'):
+    """Модель со встроенным скейлером и диапазон цен скейлера (min, max).
+
+    .h5 и .pkl читаются только при первом запуске после смены файлов:
+    результат сохраняется в .npz с той же версией, и следующие запуски не
+    импортируют ни h5py, ни sklearn. В .npz всегда лежат float32-веса,
+    сжатие до precision делается после чтения.
+    """
+    model, price_range = _load_folded_float32(model_path, scaler_path, version)
+    return model.quantize(precision), price_range
+
+
+def _load_folded_float32(model_path, scaler_path, version):
+    compiled_path = _compiled_path(model_path)
+    try:
+        compiled = _read_compiled(compiled_path, version)
+    except Exception:
+        # Недописанный или битый .npz (BadZipFile, EOFError, ...) - просто промах кэша:
+        # модель собирается заново из .h5/.pkl, и файл перезаписывается
+        compiled = None
+    if compiled is not None:
+        return compiled
+
+    import joblib
+
+    scaler = joblib.load(scaler_path)
+    model = NumpyLSTMModel.from_h5(model_path).fold_scaler(scaler)
+    price_range = (float(scaler.data_min_[0]), float(scaler.data_max_[0]))
+    try:
+        _write_compiled(compiled_path, model, version, price_range)
+    except OSError:
+        pass
+    return model, price_range
+
+
+def check_parity(models_dir, metals, lookback_days, windows=256, seed=0):
+    """Сравнивает прогнозы NumPy и Keras на случайных окнах в диапазоне скейлера"""
+    import joblib
+    from tensorflow.keras.models import load_model
+
+    rng = np.random.default_rng(seed)
+    report = {}
+    for metal in metals:
+        model_path = os.path.join(models_dir, f"{metal}_model.h5")
+        scaler = joblib.load(os.path.join(models_dir, f"{metal}_scaler.pkl"))
+        keras_model = load_model(model_path, compile=False)
+        numpy_model = NumpyLSTMModel.from_h5(model_path).fold_scaler(scaler)
+
+        low, high = scaler.data_min_[0], scaler.data_max_[0]
+        walk = np.cumsum(rng.normal(0, (high - low) * 0.01, size=(windows, lookback_days)), axis=1)
+        prices = np.clip(rng.uniform(low, high, size=(windows, 1)) + walk, low, high)
+
+        scaled = scaler.transform(prices.reshape(-1, 1)).reshape(windows, lookback_days, 1)
+        expected = scaler.inverse_transform(np.asarray(keras_model.predict_on_batch(scaled)).reshape(-1, 1))
+        expected = expected.reshape(windows, -1)
+        actual = numpy_model.predict_on_batch(prices[:, :, None]).astype(np.float64)
+
+        rel_error = np.abs(actual - expected) / np.maximum(np.abs(expected), 1e-9)
+        report[metal] = {
+            "max_abs_error": float(np.abs(actual - expected).max()),
+            "max_rel_error": float(rel_error.max()),
+            "ok": bool(rel_error.max() <= PARITY_RTOL),
+        }
+    return report
+
+
+if __name__ == "__main__":
+    from metal_forecast_api import BASE_DIR, LOOKBACK_DAYS, MODELS_DIR, SUPPORTED_METALS
+
+    result = check_parity(os.path.join(BASE_DIR, MODELS_DIR), SUPPORTED_METALS, LOOKBACK_DAYS)
+    print(json.dumps(result, indent=2))
+    sys.exit(0 if all(item["ok"] for item in result.values()) else 1)
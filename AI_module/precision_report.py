@@ -0,0 +1,129 @@
+"""Сравнение режимов FORECAST_PRECISION с полноточными моделями из .h5.
+
+Для каждого металла все исторические окна (как в backtest.py) прогоняются
+через эталон - Keras по исходному .h5 (или float32 NumPy, если TensorFlow
+не установлен) - и через numpy-модель в каждом режиме точности. В отчете:
+расхождение с эталоном, MAPE относительно фактических цен, объем весов в
+памяти и задержка predict на пачках разного размера.
+
+    python precision_report.py --source history.json --output precision.json
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from backtest import load_history
+from model_registry import file_version
+from numpy_runtime import PRECISIONS, load_folded_model
+
+
+def keras_reference(model_path, scaler_path):
+    """predict (N, lookback) -> (N, outputs) по исходному .h5 через Keras"""
+    import joblib
+    from tensorflow.keras.models import load_model
+
+    scaler = joblib.load(scaler_path)
+    model = load_model(model_path, compile=False)
+
+    def predict(windows):
+        n, lookback = windows.shape
+        scaled = scaler.transform(windows.reshape(-1, 1)).reshape(n, lookback, 1)
+        prediction = np.asarray(model.predict_on_batch(scaled)).reshape(-1, 1)
+        return scaler.inverse_transform(prediction).reshape(n, -1)
+
+    return predict
+
+
+def median_latency_ms(model, windows, repeats):
+    batch = windows[:, :, np.newaxis]
+    model.predict_on_batch(batch)
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        model.predict_on_batch(batch)
+        samples.append(time.perf_counter() - start)
+    return round(float(np.median(samples)) * 1000, 3)
+
+
+def compare_precisions(model_path, scaler_path, prices, lookback, precisions, reference, batch_sizes, repeats):
+    version = file_version(model_path, scaler_path)
+    full_model, _ = load_folded_model(model_path, scaler_path, version)
+    if reference == 'keras':
+        predict_reference = keras_reference(model_path, scaler_path)
+    else:
+        predict_reference = lambda windows: full_model.predict_on_batch(windows[:, :, np.newaxis])
+
+    outputs = full_model.layers[-1]["bias"].shape[0]
+    # Каждому окну нужны lookback цен на вход и outputs следующих цен для сравнения
+    if len(prices) < lookback + outputs:
+        return {"error": f"Need at least {lookback + outputs} prices, got {len(prices)}"}
+    view = sliding_window_view(np.asarray(prices, dtype=np.float64), lookback + outputs)
+    inputs, targets = view[:, :lookback], view[:, lookback:]
+    expected = np.asarray(predict_reference(inputs), dtype=np.float64)
+
+    report = {"windows": len(view), "reference": reference, "precisions": {}}
+    for precision in precisions:
+        model = full_model.quantize(precision)
+        actual = model.predict_on_batch(inputs[:, :, np.newaxis]).astype(np.float64)
+        rel_error = np.abs(actual - expected) / np.abs(expected)
+        report["precisions"][precision] = {
+            "weights_bytes": model.nbytes,
+            "max_rel_error_vs_reference": float(rel_error.max()),
+            "mean_rel_error_vs_reference": float(rel_error.mean()),
+            "mape_percent": np.round((np.abs(actual - targets) / np.abs(targets)).mean(axis=0) * 100, 4).tolist(),
+            "latency_ms": {
+                str(size): median_latency_ms(model, inputs[:size], repeats)
+                for size in batch_sizes if size <= len(inputs)
+            },
+        }
+    return report
+
+
+def main():
+    from metal_forecast_api import BASE_DIR, LOOKBACK_DAYS, MODELS_DIR
+
+    parser = argparse.ArgumentParser(description="Accuracy, memory and latency of the reduced-precision modes")
+    parser.add_argument('--source', default='http://localhost:8000/api/historical_metals',
+                        help="URL or JSON file in the /api/historical_metals format")
+    parser.add_argument('--precisions', nargs='+', default=list(PRECISIONS), choices=PRECISIONS)
+    parser.add_argument('--reference', choices=('keras', 'float32'), default=None,
+                        help="keras if TensorFlow is installed, float32 NumPy otherwise")
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 64])
+    parser.add_argument('--repeats', type=int, default=50)
+    parser.add_argument('--output', default=None, help="write the report as JSON")
+    args = parser.parse_args()
+
+    reference = args.reference
+    if reference is None:
+        try:
+            import tensorflow  # noqa: F401
+            reference = 'keras'
+        except ImportError:
+            reference = 'float32'
+
+    models_dir = os.path.join(BASE_DIR, MODELS_DIR)
+    report = {}
+    for metal, prices in load_history(args.source).items():
+        model_path = os.path.join(models_dir, f"{metal}_model.h5")
+        scaler_path = os.path.join(models_dir, f"{metal}_scaler.pkl")
+        report[metal] = compare_precisions(model_path, scaler_path, prices, LOOKBACK_DAYS, args.precisions,
+                                           reference, args.batch_sizes, args.repeats)
+        if "error" in report[metal]:
+            print(f"{metal:<10} skipped: {report[metal]['error']}")
+            continue
+        for precision, result in report[metal]["precisions"].items():
+            print(f"{metal:<10} {precision:<8} weights={result['weights_bytes']:<7} "
+                  f"max_rel_err={result['max_rel_error_vs_reference']:.2e} "
+                  f"mape={result['mape_percent']} latency_ms={result['latency_ms']}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
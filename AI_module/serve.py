@@ -0,0 +1,104 @@
+"""Запуск metal_forecast_api в нескольких процессах с общим сокетом.
+
+Родитель один раз открывает порт и запускает workers процессов; каждый
+процесс сам загружает реестр моделей (startup-событие приложения), при
+--pin закрепляется за своим набором ядер и ограничивает число потоков
+NumPy/TensorFlow, чтобы процессы не отнимали ядра друг у друга.
+
+    python serve.py --workers 4 --threads 1 --pin --port 8001
+"""
+import argparse
+import multiprocessing
+import os
+import signal
+import time
+
+import uvicorn
+
+APP = "metal_forecast_api:app"
+# Переменные, которые читают OpenMP/BLAS и TensorFlow при импорте
+THREAD_ENV_VARS = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS', 'TF_NUM_INTRAOP_THREADS')
+
+
+def available_cpus():
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def cpu_sets(workers, threads):
+    """Раздает каждому процессу threads ядер подряд, по кругу, если ядер мало"""
+    cpus = available_cpus()
+    return [
+        [cpus[(index * threads + offset) % len(cpus)] for offset in range(threads)]
+        for index in range(workers)
+    ]
+
+
+def run_worker(index, config_kwargs, sockets, cpus, threads):
+    for name in THREAD_ENV_VARS:
+        os.environ[name] = str(threads)
+    os.environ['TF_NUM_INTEROP_THREADS'] = '1'
+    os.environ['FORECAST_WORKER_INDEX'] = str(index)
+    if cpus and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cpus)
+
+    config = uvicorn.Config(APP, **config_kwargs)
+    uvicorn.Server(config).run(sockets=sockets)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-fork launcher for the metal forecast API")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--threads', type=int, default=1, help="intra-op threads per worker")
+    parser.add_argument('--pin', action='store_true', help="pin each worker to its own CPU set (Linux)")
+    parser.add_argument('--log-level', default='warning')
+    args = parser.parse_args()
+
+    config_kwargs = {"host": args.host, "port": args.port, "log_level": args.log_level}
+    sockets = [uvicorn.Config(APP, **config_kwargs).bind_socket()]
+    pinned = cpu_sets(args.workers, args.threads) if args.pin else [None] * args.workers
+
+    context = multiprocessing.get_context('spawn')
+    processes = {}
+
+    def start(index):
+        process = context.Process(
+            target=run_worker,
+            args=(index, config_kwargs, sockets, pinned[index], args.threads),
+            name=f"forecast-worker-{index}",
+        )
+        process.start()
+        processes[index] = process
+
+    stopping = False
+
+    def stop(*_):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    for index in range(args.workers):
+        start(index)
+    print(f"Started {args.workers} workers on {args.host}:{args.port}"
+          + (f", CPU sets {pinned}" if args.pin else ""))
+
+    # Упавший процесс перезапускаем с тем же номером и набором ядер
+    while not stopping:
+        for index, process in list(processes.items()):
+            if not process.is_alive() and not stopping:
+                start(index)
+        time.sleep(0.5)
+
+    for process in processes.values():
+        process.terminate()
+    for process in processes.values():
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
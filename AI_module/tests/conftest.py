@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Модули сервиса прогнозов импортируют друг друга без пакета, как при запуске uvicorn из AI_module
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+
+import forecast_cache
+from forecast_cache import ForecastCache
+
+WINDOW = np.linspace(6000, 6100, 60)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(forecast_cache.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_key_depends_on_every_part():
+    key = ForecastCache.key('gold', 'v1', WINDOW, 3)
+    assert ForecastCache.key('gold', 'v1', WINDOW.copy(), 3) == key
+    assert ForecastCache.key('gold', 'v1', WINDOW.astype(np.float32).astype(np.float64), 3) != key
+    assert ForecastCache.key('silver', 'v1', WINDOW, 3) != key
+    assert ForecastCache.key('gold', 'v2', WINDOW, 3) != key
+    assert ForecastCache.key('gold', 'v1', WINDOW, 7) != key
+    assert ForecastCache.key('gold', 'v1', WINDOW + 0.01, 3) != key
+
+
+def test_lru_evicts_least_recently_used():
+    cache = ForecastCache(max_entries=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+    assert cache.stats()['evictions'] == 1
+
+
+def test_put_existing_key_replaces_value_without_eviction():
+    cache = ForecastCache(max_entries=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.put('a', 10)
+    assert cache.get('a') == 10
+    assert cache.get('b') == 2
+    assert cache.stats()['evictions'] == 0
+
+
+def test_ttl_expires_entries(clock):
+    cache = ForecastCache(ttl_seconds=60)
+    cache.put('a', 1)
+    clock[0] += 59
+    assert cache.get('a') == 1
+    clock[0] += 1
+    assert cache.get('a') is None
+    assert cache.stats()['size'] == 0
+
+
+def test_get_does_not_extend_ttl(clock):
+    cache = ForecastCache(ttl_seconds=60)
+    cache.put('a', 1)
+    clock[0] += 50
+    assert cache.get('a') == 1
+    clock[0] += 10
+    assert cache.get('a') is None
+
+
+def test_invalidate_one_metal_or_all():
+    cache = ForecastCache()
+    gold = ForecastCache.key('gold', 'v1', WINDOW, 3)
+    silver = ForecastCache.key('silver', 'v1', WINDOW, 3)
+    cache.put(gold, (1.0,))
+    cache.put(silver, (2.0,))
+    cache.invalidate('gold')
+    assert cache.get(gold) is None
+    assert cache.get(silver) == (2.0,)
+    cache.invalidate()
+    assert cache.get(silver) is None
+
+
+def test_stats_count_hits_and_misses():
+    cache = ForecastCache()
+    cache.put('a', 1)
+    cache.get('a')
+    cache.get('a')
+    cache.get('b')
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['hit_rate']) == (2, 1, 0.6667)
@@ -0,0 +1,53 @@
+import asyncio
+import threading
+
+import pytest
+
+from inference_executor import ExecutorBusy, InferenceExecutor
+
+
+@pytest.fixture
+def executor():
+    executor = InferenceExecutor(workers=1, queue_size=1)
+    yield executor
+    executor.shutdown()
+
+
+def test_rejects_when_workers_and_queue_are_full(executor):
+    release = threading.Event()
+    running = executor.submit(release.wait)
+    queued = executor.submit(lambda: 'queued')
+    with pytest.raises(ExecutorBusy):
+        executor.submit(lambda: 'rejected')
+    assert executor.stats()['rejected'] == 1
+    release.set()
+    assert running.result(timeout=5) is True
+    assert queued.result(timeout=5) == 'queued'
+    assert executor.submit(lambda: 'again').result(timeout=5) == 'again'
+
+
+def test_admit_shares_the_limit_without_a_thread(executor):
+    with executor.admit(), executor.admit():
+        assert executor.stats()['in_flight'] == 2
+        with pytest.raises(ExecutorBusy):
+            executor.submit(lambda: None)
+        with pytest.raises(ExecutorBusy):
+            with executor.admit():
+                pass
+    stats = executor.stats()
+    assert (stats['in_flight'], stats['completed'], stats['rejected']) == (0, 2, 2)
+    assert executor.submit(lambda: 'free').result(timeout=5) == 'free'
+
+
+def test_slot_is_released_after_error(executor):
+    def fail():
+        raise ValueError('boom')
+
+    for _ in range(3):
+        with pytest.raises(ValueError):
+            executor.submit(fail).result(timeout=5)
+    assert executor.stats()['completed'] == 3
+
+
+def test_run_awaits_result(executor):
+    assert asyncio.run(executor.run(lambda x: x * 2, 21)) == 42
@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+api = pytest.importorskip('metal_forecast_api')
+from fastapi import HTTPException
+
+WINDOW = np.linspace(6000, 6100, api.LOOKBACK_DAYS)
+
+
+@pytest.mark.parametrize('dtype_name, dtype', [('float32', '<f4'), ('float64', '<f8')])
+def test_decodes_little_endian_body(dtype_name, dtype):
+    body = WINDOW.astype(dtype).tobytes()
+    window = api.decode_raw_prices(body, dtype_name)
+    assert window.dtype == np.dtype(dtype)
+    np.testing.assert_array_equal(window, WINDOW.astype(dtype))
+
+
+@pytest.mark.parametrize('size', [0, 59, 61])
+def test_rejects_wrong_number_of_values(size):
+    with pytest.raises(HTTPException) as error:
+        api.decode_raw_prices(np.ones(size, '<f8').tobytes(), 'float64')
+    assert error.value.status_code == 400
+
+
+def test_rejects_body_of_other_dtype():
+    # 60 float32 - это 240 байт, а для float64 нужно 480
+    with pytest.raises(HTTPException):
+        api.decode_raw_prices(WINDOW.astype('<f4').tobytes(), 'float64')
+
+
+def test_rejects_unknown_dtype():
+    with pytest.raises(HTTPException) as error:
+        api.decode_raw_prices(WINDOW.astype('<f2').tobytes(), 'float16')
+    assert 'float32' in error.value.detail
+
+
+def test_rejects_non_finite_prices():
+    prices = WINDOW.copy()
+    prices[10] = np.nan
+    with pytest.raises(HTTPException):
+        api.decode_raw_prices(prices.tobytes(), 'float64')
@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+from model_registry import Rollout, rollout
+
+LOOKBACK = 60
+STEPS = 3
+
+
+def fake_predict(calls):
+    """predict модели на 3 дня: следующие дни - последняя цена окна + 1, + 2, + 3"""
+
+    def predict(windows):
+        calls.append(windows.copy())
+        return windows[:, -1:] + np.arange(1, STEPS + 1)
+
+    return predict
+
+
+def windows(n=2):
+    return np.arange(n * LOOKBACK, dtype=np.float64).reshape(n, LOOKBACK) * 10
+
+
+@pytest.mark.parametrize('horizon, predicts', [(1, 1), (3, 1), (4, 2), (7, 3), (8, 3), (90, 30)])
+def test_horizon_slices_last_step(horizon, predicts):
+    calls = []
+    start = windows()
+    result = rollout(fake_predict(calls), start, horizon)
+    assert result.shape == (2, horizon)
+    assert len(calls) == predicts
+    # Каждый день прогноза на 1 больше предыдущего, начиная с последней цены окна
+    np.testing.assert_array_equal(result, start[:, -1:] + np.arange(1, horizon + 1))
+
+
+def test_windows_slide_by_previous_steps():
+    calls = []
+    start = windows()
+    rollout(fake_predict(calls), start, 7)
+    np.testing.assert_array_equal(calls[0], start)
+    for previous, current in zip(calls, calls[1:]):
+        assert current.shape == (2, LOOKBACK)
+        np.testing.assert_array_equal(current[:, :-STEPS], previous[:, STEPS:])
+        np.testing.assert_array_equal(current[:, -STEPS:], previous[:, -1:] + np.arange(1, STEPS + 1))
+
+
+def test_rows_are_independent():
+    start = windows(3)
+    together = rollout(fake_predict([]), start, 8)
+    for row in range(3):
+        np.testing.assert_array_equal(together[row], rollout(fake_predict([]), start[row:row + 1], 8)[0])
+
+
+def test_stepwise_state_matches_rollout():
+    start = windows()
+    predict = fake_predict([])
+    state = Rollout(start, 5)
+    assert not state.done
+    while not state.done:
+        state.add(predict(state.windows))
+    np.testing.assert_array_equal(state.result(), rollout(fake_predict([]), start, 5))
+    # Исходные окна не меняются
+    np.testing.assert_array_equal(start, windows())
+
+
+def test_batch_forecast_slices_each_row_to_its_horizon(monkeypatch):
+    api = pytest.importorskip('metal_forecast_api')
+    monkeypatch.setattr(api, 'cache', api.ForecastCache())
+
+    class Entry:
+        version = 'test'
+
+        def forecast(self, batch):
+            return fake_predict([])(batch)
+
+    start = windows(3)
+    rows = [(index, start[index], horizon, ('gold', 'test', horizon, index))
+            for index, horizon in enumerate((1, 5, 3))]
+    results = api.run_batch_forecast({'gold': (Entry(), rows)})
+    for index, horizon in enumerate((1, 5, 3)):
+        expected = (start[index, -1] + np.arange(1, horizon + 1)).tolist()
+        assert results[index] == expected
+        assert api.cache.get(('gold', 'test', horizon, index)) == tuple(expected)
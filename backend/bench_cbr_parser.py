@@ -0,0 +1,117 @@
+"""Бенчмарк разбора ответа ЦБ xml_metall.asp на синтетических данных.
+
+Строит ответ в формате ЦБ (windows-1251, цены через запятую, четыре металла
+на каждый день) за --years лет и сравнивает потоковый parse_metal_prices с
+прежним разбором через BeautifulSoup (если установлены beautifulsoup4 и
+lxml): время и пиковую память (tracemalloc) на один разбор. Результаты
+обоих способов сверяются.
+
+    python bench_cbr_parser.py --years 20 --repeat 3 --output parser.json
+"""
+import argparse
+import json
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from cbr_parser import parse_metal_prices
+from price_series import PriceSeries
+
+try:
+    from bs4 import BeautifulSoup
+except ImportError:
+    BeautifulSoup = None
+
+METAL_CODES = {'1': 'Золото', '2': 'Серебро', '3': 'Платина', '4': 'Палладий'}
+START_PRICES = {'1': 5000.0, '2': 60.0, '3': 2500.0, '4': 4000.0}
+
+
+def synthetic_payload(years, seed=0):
+    rng = np.random.default_rng(seed)
+    end = date.today()
+    start = end - timedelta(days=int(years * 365))
+    days = (end - start).days + 1
+    lines = [
+        '<?xml version="1.0" encoding="windows-1251"?>',
+        f'<Metall FromDate="{start:%Y%m%d}" ToDate="{end:%Y%m%d}" name="Драгоценные металлы">',
+    ]
+    walks = {code: price * np.exp(np.cumsum(rng.normal(0, 0.01, days))) for code, price in START_PRICES.items()}
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        for code, walk in walks.items():
+            price = f"{walk[offset]:.2f}".replace('.', ',')
+            lines.append(f'<Record Date="{day:%d.%m.%Y}" Code="{code}"><Buy>{price}</Buy><Sell>{price}</Sell></Record>')
+    lines.append('</Metall>')
+    return '\n'.join(lines).encode('cp1251'), days * len(walks)
+
+
+def parse_with_soup(content):
+    """Прежний разбор из main.fetch_and_update_metal_prices"""
+    soup = BeautifulSoup(content, 'xml')
+    rows = {name: [] for name in METAL_CODES.values()}
+    for record in soup.find_all('Record'):
+        try:
+            code = record['Code']
+            if code not in METAL_CODES:
+                continue
+            buy_price = float(record.find('Buy').text.replace(',', '.'))
+            day = datetime.strptime(record['Date'], '%d.%m.%Y').toordinal()
+            rows[METAL_CODES[code]].append((day, buy_price))
+        except Exception:
+            continue
+    return {name: PriceSeries.from_rows(records) for name, records in rows.items()}
+
+
+def measure(parse, content, chunk_size, repeat):
+    chunks = [content[i:i + chunk_size] for i in range(0, len(content), chunk_size)]
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = parse(chunks)
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    parse(chunks)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, {"best_ms": round(min(times) * 1000, 1), "peak_mb": round(peak / 2 ** 20, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the CBR xml_metall.asp parser")
+    parser.add_argument('--years', type=float, default=20)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--chunk-size', type=int, default=64 * 1024)
+    parser.add_argument('--output', default=None, help="write results as JSON")
+    args = parser.parse_args()
+
+    content, records = synthetic_payload(args.years)
+    report = {"years": args.years, "records": records, "payload_mb": round(len(content) / 2 ** 20, 1)}
+    print(f"payload: {records} records, {report['payload_mb']} MB")
+
+    streaming, report["streaming"] = measure(
+        lambda chunks: parse_metal_prices(iter(chunks), METAL_CODES), content, args.chunk_size, args.repeat)
+    print(f"streaming     {report['streaming']}")
+
+    if BeautifulSoup is not None:
+        soup, report["beautifulsoup"] = measure(
+            lambda chunks: parse_with_soup(b''.join(chunks)), content, args.chunk_size, args.repeat)
+        print(f"beautifulsoup {report['beautifulsoup']}")
+        same = all(
+            np.array_equal(streaming[name].days, soup[name].days)
+            and np.array_equal(streaming[name].prices, soup[name].prices)
+            for name in METAL_CODES.values()
+        )
+        report["same_result"] = same
+        print(f"same result: {same}")
+    else:
+        print("beautifulsoup4 не установлен - сравнение пропущено")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+from array import array
+from datetime import date
+import xml.etree.ElementTree as ET
+
+from price_series import PriceSeries
+
+
+def day_ordinal(text):
+    """'дд.мм.гггг' -> date.toordinal() без strptime"""
+    return date(int(text[6:10]), int(text[3:5]), int(text[0:2])).toordinal()
+
+
+def parse_metal_prices(chunks, metal_codes):
+    """Разбирает ответ xml_metall.asp потоково: {металл: PriceSeries} с ценой покупки.
+
+    chunks - байты ответа (одним куском или итератором кусков, например
+    response.iter_content()); metal_codes - {код ЦБ: название металла}.
+    Каждая запись <Record> сразу дописывается в массивы своего металла и
+    удаляется из дерева, поэтому память не растет с размером ответа.
+    Записи с неизвестным кодом или неразборчивой датой/ценой пропускаются.
+    """
+    if isinstance(chunks, (bytes, bytearray)):
+        chunks = (chunks,)
+    days = {code: array('q') for code in metal_codes}
+    prices = {code: array('d') for code in metal_codes}
+    # Одна и та же дата повторяется у всех металлов - разбираем ее один раз
+    ordinals = {}
+
+    parser = ET.XMLPullParser(events=('start', 'end'))
+    root = None
+    for chunk in chunks:
+        parser.feed(chunk)
+        for event, elem in parser.read_events():
+            if event == 'start':
+                if root is None:
+                    root = elem
+                continue
+            if elem.tag != 'Record':
+                continue
+            code = elem.get('Code')
+            if code in days:
+                try:
+                    text = elem.get('Date')
+                    day = ordinals.get(text)
+                    if day is None:
+                        day = ordinals[text] = day_ordinal(text)
+                    price = float(elem.findtext('Buy').replace(',', '.'))
+                except (TypeError, ValueError, AttributeError):
+                    pass
+                else:
+                    days[code].append(day)
+                    prices[code].append(price)
+            # Разобранные записи больше не нужны ни корню, ни нам
+            root.clear()
+    parser.close()
+
+    return {
+        name: PriceSeries.from_arrays(days[code], prices[code])
+        for code, name in metal_codes.items()
+    }
@@ -0,0 +1,48 @@
+import numpy as np
+
+
+def lttb_indices(x, y, points):
+    """Индексы points точек ряда (x, y), выбранных методом Largest-Triangle-Three-Buckets.
+
+    Первая и последняя точки сохраняются, остальные делятся на points - 2
+    корзины; из каждой берется точка, образующая наибольший треугольник с
+    уже выбранной точкой предыдущей корзины и средней точкой следующей.
+    Так сохраняются пики и провалы, которые теряются при простом шаге.
+    Выбор зависит от предыдущей корзины, поэтому цикл идет по корзинам,
+    а площади внутри корзины считаются одной векторной операцией.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if points >= n or points < 3:
+        return np.arange(n)
+
+    buckets = points - 2
+    # Границы корзин по точкам 1..n-2: корзина i - [edges[i], edges[i + 1])
+    edges = (np.arange(buckets + 1) * (n - 2) / buckets).astype(np.int64) + 1
+    starts, stops = edges[:-1], edges[1:]
+
+    # Средние точки корзин через префиксные суммы; после последней корзины - последняя точка
+    x_sums = np.concatenate([[0.0], np.cumsum(x)])
+    y_sums = np.concatenate([[0.0], np.cumsum(y)])
+    sizes = stops - starts
+    next_x = np.append(((x_sums[stops] - x_sums[starts]) / sizes)[1:], x[-1])
+    next_y = np.append(((y_sums[stops] - y_sums[starts]) / sizes)[1:], y[-1])
+
+    # Корзины как строки матрицы одной ширины: короткие дополняются своей последней точкой,
+    # argmax возвращает первое вхождение максимума, поэтому повтор не выбирается вместо оригинала
+    width = int(sizes.max())
+    candidates = np.minimum(starts[:, None] + np.arange(width), stops[:, None] - 1)
+    bucket_x = x[candidates]
+    bucket_y = y[candidates]
+
+    selected = np.empty(points, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    ax, ay = x[0], y[0]
+    for i in range(buckets):
+        # Удвоенная площадь треугольника (a, кандидат, средняя точка следующей корзины)
+        areas = np.abs((ax - next_x[i]) * (bucket_y[i] - ay) - (ax - bucket_x[i]) * (next_y[i] - ay))
+        best = int(areas.argmax())
+        selected[i + 1] = candidates[i, best]
+        ax, ay = bucket_x[i, best], bucket_y[i, best]
+    return selected
@@ -0,0 +1,47 @@
+import sqlite3
+import threading
+
+
+class HistoryStore:
+    """История цен металлов на диске: (металл, день как date.toordinal(), цена).
+
+    Одна таблица SQLite с первичным ключом (металл, день), поэтому повторная
+    запись того же дня просто заменяет цену.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            # WAL: запись не блокирует чтение, а fsync на каждую транзакцию не нужен
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            with self._conn:
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS prices ("
+                    " metal TEXT NOT NULL, day INTEGER NOT NULL, price REAL NOT NULL,"
+                    " PRIMARY KEY (metal, day)) WITHOUT ROWID"
+                )
+
+    def load(self, since=None):
+        """{металл: [(день, цена), ...]} по возрастанию дня, начиная с since (если задан)"""
+        history = {}
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT metal, day, price FROM prices WHERE day >= ? ORDER BY metal, day",
+                (since if since is not None else 0,),
+            ).fetchall()
+        for metal, day, price in rows:
+            history.setdefault(metal, []).append((day, price))
+        return history
+
+    def save(self, history):
+        """history: {металл: [(день, цена), ...]}"""
+        rows = [(metal, day, price) for metal, records in history.items() for day, price in records]
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO prices (metal, day, price) VALUES (?, ?, ?)", rows)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,213 @@
+import bisect
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ReadTimeoutError
+from urllib3.util.retry import Retry
+
+# Границы корзин задержек в секундах
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+# Статусы, после которых запрос можно безопасно повторить
+RETRY_STATUSES = (502, 503, 504)
+
+
+class PoolTimeout(requests.exceptions.ConnectionError):
+    """Все соединения к сервису заняты дольше pool_timeout"""
+
+
+class CountingRetry(Retry):
+    """Retry, который сообщает о каждом повторе в on_retry.
+
+    MaxRetryError не несет историю попыток, поэтому повторы перед
+    окончательной ошибкой иначе не посчитать.
+    """
+
+    def __init__(self, *args, on_retry=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.on_retry = on_retry
+
+    def new(self, **kwargs):
+        retry = super().new(**kwargs)
+        retry.on_retry = self.on_retry
+        return retry
+
+    def increment(self, *args, **kwargs):
+        # Последняя попытка поднимает MaxRetryError и повтором не считается
+        retry = super().increment(*args, **kwargs)
+        if self.on_retry is not None:
+            self.on_retry()
+        return retry
+
+
+class Upstream:
+    """Пул keep-alive соединений к одному внешнему сервису.
+
+    Не больше max_connections одновременных запросов: остальные ждут
+    свободное место не дольше pool_timeout секунд (по умолчанию - таймаут
+    подключения) и получают PoolTimeout. Таймауты (подключение, ответ) по
+    умолчанию для каждого запроса и ограниченные повторы: только ошибки
+    подключения и 502/503/504 для методов из retry_methods. Таймаут ответа
+    не повторяется, чтобы зависший сервис не держал поток вдвое дольше.
+
+    При stream=True тело читается после возврата из request(): место в пуле
+    занято, а задержка считается до response.close(), поэтому такой ответ
+    нужно закрыть (with upstream.get(..., stream=True) as response).
+    """
+
+    def __init__(self, name, max_connections=10, connect_timeout=3.0, read_timeout=10.0,
+                 retries=2, backoff=0.2, retry_methods=('GET',), headers=None, pool_timeout=None):
+        self.name = name
+        self.max_connections = max_connections
+        self.timeout = (connect_timeout, read_timeout)
+        self.pool_timeout = connect_timeout if pool_timeout is None else pool_timeout
+        # Очередь к сервису ограничена здесь: requests не передает urllib3 время ожидания пула,
+        # поэтому пул не блокирует (pool_block=False) и только хранит max_connections соединений
+        self._slots = threading.BoundedSemaphore(max_connections)
+        # Повторы текущего запроса; urllib3 повторяет в том же потоке
+        self._local = threading.local()
+        retry = CountingRetry(
+            total=retries,
+            connect=retries,
+            read=0,
+            status=retries,
+            backoff_factor=backoff,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset(retry_methods),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+            on_retry=self._count_retry,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_connections, pool_block=False, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        if headers:
+            self.session.headers.update(headers)
+
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.retries = 0
+        self.in_flight = 0
+        self.errors = {}
+        self.statuses = {}
+        self.latency_buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+        self.last_error = None
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        with self._lock:
+            self.in_flight += 1
+        start = time.perf_counter()
+        if not self._slots.acquire(timeout=self.pool_timeout):
+            error = PoolTimeout(f"{self.name}: нет свободного соединения за {self.pool_timeout} с")
+            self._record(time.perf_counter() - start, error=error)
+            raise error
+        self._local.retries = 0
+        try:
+            response = self.session.request(method, url, **kwargs)
+        except requests.exceptions.RequestException as e:
+            self._slots.release()
+            self._record(time.perf_counter() - start, error=e, retries=self._local.retries)
+            raise
+        except BaseException:
+            self._slots.release()
+            with self._lock:
+                self.in_flight -= 1
+            raise
+        finish = self._finisher(response, start, self._local.retries)
+        if kwargs.get('stream'):
+            close = response.close
+
+            def close_and_finish():
+                try:
+                    close()
+                finally:
+                    finish()
+
+            response.close = close_and_finish
+        else:
+            finish()
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def _count_retry(self):
+        self._local.retries += 1
+
+    def _finisher(self, response, start, retries):
+        """Освобождает место в пуле и записывает ответ; повторные вызовы ничего не делают"""
+        finished = []
+
+        def finish():
+            if finished:
+                return
+            finished.append(True)
+            self._slots.release()
+            self._record(time.perf_counter() - start, status=response.status_code, retries=retries)
+
+        return finish
+
+    def _record(self, seconds, status=None, error=None, retries=0):
+        index = bisect.bisect_left(LATENCY_BUCKETS, seconds)
+        with self._lock:
+            self.in_flight -= 1
+            self.requests += 1
+            self.retries += retries
+            self.latency_buckets[index] += 1
+            self.latency_sum += seconds
+            self.latency_max = max(self.latency_max, seconds)
+            if error is not None:
+                kind = error_kind(error)
+                self.errors[kind] = self.errors.get(kind, 0) + 1
+                self.last_error = f"{kind}: {error}"
+            else:
+                key = str(status)
+                self.statuses[key] = self.statuses.get(key, 0) + 1
+
+    def stats(self):
+        with self._lock:
+            cumulative = {}
+            running = 0
+            for bound, count in zip(LATENCY_BUCKETS, self.latency_buckets):
+                running += count
+                cumulative[str(bound)] = running
+            cumulative["+Inf"] = self.requests
+            return {
+                "max_connections": self.max_connections,
+                "timeout_seconds": list(self.timeout),
+                "pool_timeout_seconds": self.pool_timeout,
+                "requests": self.requests,
+                "in_flight": self.in_flight,
+                "retries": self.retries,
+                "statuses": dict(self.statuses),
+                "errors": dict(self.errors),
+                "last_error": self.last_error,
+                "latency_seconds": {
+                    "buckets": cumulative,
+                    "sum": round(self.latency_sum, 6),
+                    "max": round(self.latency_max, 6),
+                    "mean": round(self.latency_sum / self.requests, 6) if self.requests else 0.0,
+                },
+            }
+
+
+def error_kind(error):
+    if isinstance(error, PoolTimeout):
+        return "pool_timeout"
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return "connect_timeout"
+    # При read=0 в Retry requests заворачивает таймаут ответа в ConnectionError(MaxRetryError)
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    if isinstance(error, requests.exceptions.ReadTimeout) or isinstance(reason, ReadTimeoutError):
+        return "read_timeout"
+    if isinstance(error, requests.exceptions.ConnectionError):
+        return "connection"
+    return type(error).__name__
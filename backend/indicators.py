@@ -0,0 +1,220 @@
+import math
+from threading import Lock
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from price_series import PriceSeries
+
+# Торговых дней в году - для годовой волатильности
+TRADING_DAYS = 252
+# Вклад старых значений в ewm меньше этой доли уже не меняет результат в float64
+EWM_NEGLIGIBLE = 1e-17
+# Стандартные периоды; параметр window заменяет все, кроме MACD
+DEFAULT_PERIODS = {
+    'sma': 20,
+    'ema': 20,
+    'rsi': 14,
+    'macd': (12, 26, 9),
+    'bollinger': 20,
+    'volatility': 20,
+}
+BOLLINGER_WIDTH = 2
+
+
+def ewm(values, alpha, initial=None):
+    """Экспоненциальное сглаживание y[i] = alpha * x[i] + (1 - alpha) * y[i - 1] без цикла по элементам.
+
+    initial - значение y перед первым элементом (состояние с прошлого
+    расчета); без него y[0] = x[0]. Рекурсия считается префиксным
+    сканированием за log2(n) векторных шагов: после шага со сдвигом s в
+    y[i] собраны вклады 2s последних элементов. Множители не больше 1,
+    поэтому точность не теряется; шаги, вклад которых меньше машинной
+    точности, пропускаются.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if not len(values):
+        return values.copy()
+    decay = 1.0 - alpha
+    y = alpha * values
+    y[0] += decay * (values[0] if initial is None else initial)
+    shift = 1
+    factor = decay
+    while shift < len(y) and factor > EWM_NEGLIGIBLE:
+        y[shift:] = y[shift:] + factor * y[:-shift]
+        shift *= 2
+        factor *= factor
+    return y
+
+
+def rolling(values, start, period, reduce):
+    """reduce по окнам из period значений, заканчивающимся на индексах start..n-1; NaN, где окно неполное"""
+    out = np.full(len(values) - start, np.nan)
+    first = max(start, period - 1)
+    if first < len(values):
+        out[first - start:] = reduce(sliding_window_view(values[first - period + 1:], period))
+    return out
+
+
+# Функции индикаторов: (цены, start, период, prev) -> {имя: значения для индексов start..n-1}.
+# prev - значения всех выходов в индексе start - 1 (None при расчете с начала),
+# из него рекурсивные индикаторы продолжают счет без пересчета всей серии.
+
+def sma(prices, start, period, prev):
+    return {'sma': rolling(prices, start, period, lambda windows: windows.mean(axis=1))}
+
+
+def ema(prices, start, period, prev):
+    return {'ema': ewm(prices[start:], 2 / (period + 1), prev['ema'] if prev else None)}
+
+
+def rsi(prices, start, period, prev):
+    """RSI Уайлдера: средние роста и падения сглаживаются с alpha = 1 / period"""
+    n = len(prices)
+    avg_gain = np.full(n - start, np.nan)
+    avg_loss = np.full(n - start, np.nan)
+    if prev is not None and start > period:
+        seed, gain, loss = start - 1, prev['avg_gain'], prev['avg_loss']
+    elif n > period:
+        # Первое значение - простое среднее первых period изменений
+        changes = np.diff(prices[:period + 1])
+        seed, gain, loss = period, np.maximum(changes, 0).mean(), np.maximum(-changes, 0).mean()
+        if seed >= start:
+            avg_gain[seed - start], avg_loss[seed - start] = gain, loss
+    else:
+        seed = None
+    if seed is not None:
+        changes = np.diff(prices[seed:])
+        avg_gain[seed + 1 - start:] = ewm(np.maximum(changes, 0), 1 / period, gain)
+        avg_loss[seed + 1 - start:] = ewm(np.maximum(-changes, 0), 1 / period, loss)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        values = 100 - 100 / (1 + avg_gain / avg_loss)
+    # Цена не менялась весь период
+    values[(avg_gain == 0) & (avg_loss == 0)] = 50.0
+    return {'rsi': values, 'avg_gain': avg_gain, 'avg_loss': avg_loss}
+
+
+def macd(prices, start, periods, prev):
+    fast, slow, signal = periods
+    ema_fast = ewm(prices[start:], 2 / (fast + 1), prev['ema_fast'] if prev else None)
+    ema_slow = ewm(prices[start:], 2 / (slow + 1), prev['ema_slow'] if prev else None)
+    line = ema_fast - ema_slow
+    signal_line = ewm(line, 2 / (signal + 1), prev['macd_signal'] if prev else None)
+    return {
+        'macd': line,
+        'macd_signal': signal_line,
+        'macd_histogram': line - signal_line,
+        'ema_fast': ema_fast,
+        'ema_slow': ema_slow,
+    }
+
+
+def bollinger(prices, start, period, prev):
+    middle = rolling(prices, start, period, lambda windows: windows.mean(axis=1))
+    width = BOLLINGER_WIDTH * rolling(prices, start, period, lambda windows: windows.std(axis=1))
+    return {'bollinger_upper': middle + width, 'bollinger_middle': middle, 'bollinger_lower': middle - width}
+
+
+def volatility(prices, start, period, prev):
+    """Годовая волатильность: std дневных логарифмических доходностей за period дней * sqrt(TRADING_DAYS)"""
+    low = max(0, start - period)
+    returns = np.full(len(prices) - low, np.nan)
+    returns[1:] = np.diff(np.log(prices[low:]))
+    values = rolling(returns, start - low, period, lambda windows: windows.std(axis=1, ddof=1))
+    return {'volatility': values * math.sqrt(TRADING_DAYS)}
+
+
+# Индикатор -> (функция, выходы для ответа API; остальные выходы - внутреннее состояние)
+INDICATORS = {
+    'sma': (sma, ('sma',)),
+    'ema': (ema, ('ema',)),
+    'rsi': (rsi, ('rsi',)),
+    'macd': (macd, ('macd', 'macd_signal', 'macd_histogram')),
+    'bollinger': (bollinger, ('bollinger_upper', 'bollinger_middle', 'bollinger_lower')),
+    'volatility': (volatility, ('volatility',)),
+}
+
+
+class IndicatorColumn:
+    """Один индикатор с одним периодом, посчитанный по всей PriceSeries металла"""
+
+    __slots__ = ('kind', 'period', 'series', 'values')
+
+    def __init__(self, kind, period, series, values):
+        self.kind = kind
+        self.period = period
+        self.series = series
+        # имя выхода -> массив той же длины, что series
+        self.values = values
+
+    @classmethod
+    def compute(cls, kind, period, series):
+        function, _ = INDICATORS[kind]
+        return cls(kind, period, series, function(series.prices, 0, period, None))
+
+    def extend(self, series):
+        """Индикатор по новой серии: совпавшее начало берется готовым, считается только хвост.
+
+        Результат всегда равен compute() по той же серии. Поэтому готовые
+        значения берутся, только если серия начинается с того же дня: EMA,
+        RSI и MACD помнят все дни с начала серии, и после среза старых дней
+        они считаются заново. Досчитываются новые дни и уточненный последний.
+        """
+        old = self.series
+        function, _ = INDICATORS[self.kind]
+        keep = 0
+        if len(old) and len(series) and old.days[0] == series.days[0]:
+            overlap = min(len(old), len(series))
+            same = (old.days[:overlap] == series.days[:overlap]) & (old.prices[:overlap] == series.prices[:overlap])
+            keep = overlap if same.all() else int(np.argmin(same))
+        if keep == 0:
+            return IndicatorColumn.compute(self.kind, self.period, series)
+        prev = {name: values[keep - 1] for name, values in self.values.items()}
+        tail = function(series.prices, keep, self.period, prev)
+        values = {name: np.concatenate([self.values[name][:keep], tail[name]]) for name in self.values}
+        return IndicatorColumn(self.kind, self.period, series, values)
+
+    def outputs(self):
+        """{имя: массив} только для выходов, которые отдает API"""
+        return {name: self.values[name] for name in INDICATORS[self.kind][1]}
+
+
+class IndicatorEngine:
+    """Кэш индикаторов по (металл, индикатор, период).
+
+    get() возвращает индикатор для переданной серии: при первом обращении
+    считает его по всей серии, для новой серии того же металла досчитывает
+    хвост (или считает заново, если у серии срезано начало, поэтому серии
+    нужно передавать без скользящего окна). update() сразу после обновления
+    котировок продвигает так все уже запрошенные индикаторы, чтобы запросы
+    получали готовые массивы.
+    """
+
+    def __init__(self, max_columns=256):
+        self.max_columns = max_columns
+        self._columns = {}
+        self._lock = Lock()
+
+    def get(self, metal, kind, period, series):
+        key = (metal, kind, period)
+        with self._lock:
+            column = self._columns.get(key)
+        if column is not None and column.series is series:
+            return column
+        if column is None:
+            column = IndicatorColumn.compute(kind, period, series)
+        else:
+            column = column.extend(series)
+        with self._lock:
+            if len(self._columns) >= self.max_columns and key not in self._columns:
+                self._columns.clear()
+            self._columns[key] = column
+        return column
+
+    def update(self, history):
+        """history: {металл: PriceSeries} после обновления"""
+        with self._lock:
+            keys = list(self._columns)
+        empty = PriceSeries((), ())
+        for metal, kind, period in keys:
+            self.get(metal, kind, period, history.get(metal, empty))
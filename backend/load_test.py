@@ -0,0 +1,111 @@
+"""Нагрузочный тест бэкенда смешанным трафиком.
+
+Клиенты в отдельных потоках держат keep-alive соединения и в течение
+--duration секунд шлют запросы вперемешку: статика, /api/metals,
+/api/historical_metals и /api/forecast/<металл> (он ждет сервис прогнозов).
+Печатает задержки и число ответов по каждому виду запросов: статика и
+/api/metals не должны замедляться, пока прогнозы ждут AI-сервис.
+
+    python main.py
+    python load_test.py --clients 32 --duration 10 --output load.json
+"""
+import argparse
+import http.client
+import json
+import random
+import threading
+import time
+
+import numpy as np
+
+# Вид запроса -> (путь, доля в трафике)
+ROUTES = {
+    "static": ("/index.html", 0.4),
+    "metals": ("/api/metals", 0.3),
+    "historical": ("/api/historical_metals", 0.1),
+    "forecast": ("/api/forecast/Au", 0.2),
+}
+
+
+def run_clients(host, port, clients, duration, routes, seed):
+    names = list(routes)
+    weights = [routes[name][1] for name in names]
+    samples = {name: [] for name in names}
+    statuses = {name: {} for name in names}
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def client(index):
+        rng = random.Random(seed + index)
+        conn = http.client.HTTPConnection(host, port, timeout=60)
+        local = {name: [] for name in names}
+        local_statuses = {name: {} for name in names}
+        while time.monotonic() < stop_at:
+            name = rng.choices(names, weights)[0]
+            start = time.perf_counter()
+            try:
+                conn.request('GET', routes[name][0])
+                response = conn.getresponse()
+                response.read()
+                status = str(response.status)
+                if response.getheader('Connection', '').lower() == 'close':
+                    conn.close()
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()
+                conn = http.client.HTTPConnection(host, port, timeout=60)
+                status = type(e).__name__
+            local[name].append(time.perf_counter() - start)
+            local_statuses[name][status] = local_statuses[name].get(status, 0) + 1
+        conn.close()
+        with lock:
+            for name in names:
+                samples[name].extend(local[name])
+                for status, count in local_statuses[name].items():
+                    statuses[name][status] = statuses[name].get(status, 0) + count
+
+    threads = [threading.Thread(target=client, args=(index,)) for index in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    report = {}
+    for name in names:
+        ms = np.array(samples[name]) * 1000 if samples[name] else np.zeros(1)
+        report[name] = {
+            "requests": len(samples[name]),
+            "statuses": statuses[name],
+            "rps": round(len(samples[name]) / elapsed, 1),
+            "p50_ms": round(float(np.percentile(ms, 50)), 2),
+            "p95_ms": round(float(np.percentile(ms, 95)), 2),
+            "p99_ms": round(float(np.percentile(ms, 99)), 2),
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mixed static/API load test for the backend")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--routes', nargs='+', choices=list(ROUTES), default=list(ROUTES))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None, help="write results as JSON")
+    args = parser.parse_args()
+
+    routes = {name: ROUTES[name] for name in args.routes}
+    report = run_clients(args.host, args.port, args.clients, args.duration, routes, args.seed)
+    for name, result in report.items():
+        print(f"{name:<11} rps={result['rps']:<8} p50={result['p50_ms']}ms p95={result['p95_ms']}ms "
+              f"p99={result['p99_ms']}ms statuses={result['statuses']}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({"clients": args.clients, "duration": args.duration, "routes": report}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
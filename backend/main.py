@@ -1,17 +1,53 @@
 import http.server
-import socketserver
 import os
 import json
 import time
-from threading import Lock
+import random
+import sqlite3
+import sys
+from threading import BoundedSemaphore, Event, Lock, Thread
 import re
+import numpy as np
 import requests
 from datetime import datetime, timedelta
-from bs4 import BeautifulSoup
+from urllib.parse import parse_qs
+from cbr_parser import parse_metal_prices
+from downsample import lttb_indices
+from history_store import HistoryStore
+from http_client import Upstream
+from indicators import DEFAULT_PERIODS, IndicatorEngine
+from prepared_response import PreparedResponse
+from price_series import PriceSeries, format_day
 
-PORT = 8000
+PORT = int(os.environ.get('BACKEND_PORT', 8000))
 WEB_DIR = os.path.join(os.path.dirname(__file__), '../frontend')
 CBR_URL = 'https://www.cbr.ru/scripts/xml_metall.asp'
+# Ответ ЦБ читается кусками по 64 КБ и разбирается на лету
+CBR_CHUNK_SIZE = 64 * 1024
+AI_SERVICE_URL = os.environ.get('AI_SERVICE_URL', 'http://localhost:8001')
+# Сколько соединений обслуживается одновременно; остальные ждут в очереди accept
+MAX_CONNECTIONS = int(os.environ.get('BACKEND_MAX_CONNECTIONS', 64))
+# Через сколько секунд простоя закрывается keep-alive соединение
+KEEPALIVE_TIMEOUT = float(os.environ.get('BACKEND_KEEPALIVE_TIMEOUT', 15))
+
+# Пулы соединений к ЦБ и сервису прогнозов; таймауты (подключение, ответ) в секундах
+cbr_upstream = Upstream(
+    'cbr',
+    max_connections=int(os.environ.get('CBR_MAX_CONNECTIONS', 2)),
+    connect_timeout=float(os.environ.get('CBR_CONNECT_TIMEOUT', 5)),
+    read_timeout=float(os.environ.get('CBR_READ_TIMEOUT', 10)),
+    retries=int(os.environ.get('CBR_RETRIES', 2)),
+    headers={'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'},
+)
+# Прогноз - чистое вычисление, поэтому POST к нему тоже можно повторить (503 - очередь сервиса полна)
+ai_upstream = Upstream(
+    'ai',
+    max_connections=int(os.environ.get('AI_MAX_CONNECTIONS', 16)),
+    connect_timeout=float(os.environ.get('AI_CONNECT_TIMEOUT', 1)),
+    read_timeout=float(os.environ.get('AI_READ_TIMEOUT', 10)),
+    retries=int(os.environ.get('AI_RETRIES', 1)),
+    retry_methods=('GET', 'POST'),
+)
 
 #  структура данных о металлах
 metals_cache = [
@@ -21,245 +57,780 @@ metals_cache = [
     {"name": "Палладий", "price": "N/A", "unit": "руб./грамм", "date": "N/A"}
 ]
 
+# Металл -> PriceSeries (массивы дней и цен), строится заново при каждом обновлении
 historical_metals_data_cache = {}
+# Металл -> PriceSeries всей загруженной истории (без окна HISTORY_DAYS): по ней считаются индикаторы,
+# начало серии не сдвигается, поэтому после обновления досчитываются только новые дни
+indicator_history = {}
+# Кэши отфильтрованных ответов /api/historical_metals, /api/indicators и /api/chart:
+# нормализованные параметры запроса -> PreparedResponse; сбрасываются при обновлении данных
+QUERY_CACHE_NAMES = ('history', 'indicators', 'chart')
+query_caches = {name: {} for name in QUERY_CACHE_NAMES}
+# Индикаторы по (металл, индикатор, период); после обновления досчитываются только новые дни
+indicator_engine = IndicatorEngine()
+# ForecastSnapshot: прогнозы всех металлов, посчитанные сразу после обновления
+forecast_snapshot = None
 last_successful_update_time = 0
 metals_data_lock = Lock()
 parsing_error_message = None
 
+METAL_CODES = {
+    '1': "Золото",
+    '2': "Серебро",
+    '3': "Платина",
+    '4': "Палладий"
+}
+METAL_MAPPING = {
+    'Au': ('gold', 'Золото'),
+    'Ag': ('silver', 'Серебро'),
+    'Pt': ('platinum', 'Платина'),
+    'Pd': ('palladium', 'Палладий')
+}
+# Любое из названий металла (код, английское, русское) -> ключ кэша истории
+METAL_ALIASES = {
+    alias.lower(): name_ru
+    for code, (name_en, name_ru) in METAL_MAPPING.items()
+    for alias in (code, name_en, name_ru)
+}
+# Сколько отфильтрованных ответов /api/historical_metals хранить до следующего обновления
+MAX_CACHED_HISTORY_QUERIES = 256
+# Допустимый параметр window у /api/indicators (дней)
+MAX_INDICATOR_WINDOW = 250
+# Число точек графика /api/chart: по умолчанию и наибольшее
+DEFAULT_CHART_POINTS = 500
+MAX_CHART_POINTS = 5000
+# Сколько дней истории держим в памяти (на диске хранится все, что когда-либо загружено)
+HISTORY_DAYS = int(os.environ.get('HISTORY_DAYS', 365))
+HISTORY_DB_PATH = os.environ.get('HISTORY_DB', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'history.sqlite3'))
+# Открывается при запуске сервера; None - история только в памяти
+history_store = None
+# Обычный интервал обновления и границы повторов после ошибки (секунды)
+REFRESH_INTERVAL = float(os.environ.get('CBR_REFRESH_INTERVAL', 3600))
+RETRY_BASE_DELAY = 30
+RETRY_MAX_DELAY = REFRESH_INTERVAL
+next_refresh_time = None
+refresh_failures = 0
+
+
+def publish_metals_response():
+    """Сериализует ответ /api/metals заранее; вызывать после каждого изменения его полей"""
+    global metals_response
+    with metals_data_lock:
+        # Копия: записи metals_cache меняются на месте при обновлении
+        response_data = {
+            "data": [dict(metal_entry) for metal_entry in metals_cache],
+            "error": parsing_error_message,
+            "last_successful_data_update": last_successful_update_time,
+            "next_refresh_time": next_refresh_time
+        }
+    metals_response = PreparedResponse(response_data)
+
+
+def publish_history_response():
+    """То же для /api/historical_metals: json.dumps и сжатие - один раз на обновление, вне блокировки"""
+    global historical_response, query_caches
+    with metals_data_lock:
+        history = dict(historical_metals_data_cache)
+        error, updated = parsing_error_message, last_successful_update_time
+    historical_response = PreparedResponse({
+        "data": {name: series.to_records() for name, series in history.items()},
+        "error": error,
+        "last_successful_data_update": updated
+    })
+    with metals_data_lock:
+        query_caches = {name: {} for name in QUERY_CACHE_NAMES}
+
+
+class HistoryQueryError(ValueError):
+    pass
+
+
+def parse_query_date(value, name):
+    for date_format in ('%Y-%m-%d', '%d.%m.%Y'):
+        try:
+            return datetime.strptime(value, date_format).toordinal()
+        except ValueError:
+            continue
+    raise HistoryQueryError(f"Параметр {name}: ожидается дата ГГГГ-ММ-ДД или ДД.ММ.ГГГГ")
+
+
+def parse_query_count(value, name):
+    try:
+        count = int(value)
+    except ValueError:
+        count = 0
+    if count < 1:
+        raise HistoryQueryError(f"Параметр {name}: ожидается целое число больше 0")
+    return count
+
+
+def parse_query_metals(value):
+    """'Au,gold,...' -> кортеж русских названий без повторов; пусто - все металлы"""
+    if not value:
+        return tuple(METAL_CODES.values())
+    metals = []
+    for alias in value.split(','):
+        name = METAL_ALIASES.get(alias.strip().lower())
+        if name is None:
+            raise HistoryQueryError(f"Неизвестный металл: {alias}")
+        if name not in metals:
+            metals.append(name)
+    return tuple(metals)
+
+
+def query_params(query):
+    """Строка запроса -> {параметр: первое значение}"""
+    return {key: values[0] for key, values in parse_qs(query).items()}
+
+
+def parse_query_range(params):
+    """(from, to) как дни date.toordinal(); None, если параметр не задан"""
+    return (
+        parse_query_date(params['from'], 'from') if 'from' in params else None,
+        parse_query_date(params['to'], 'to') if 'to' in params else None,
+    )
+
+
+def parse_query_bounded(params, name, low, high, default=None):
+    """Целый параметр из [low, high] или default, если он не задан"""
+    if name not in params:
+        return default
+    value = parse_query_count(params[name], name)
+    if not low <= value <= high:
+        raise HistoryQueryError(f"Параметр {name}: ожидается число от {low} до {high}")
+    return value
+
+
+def parse_history_query(query):
+    """Строка запроса -> нормализованный кортеж (металлы, from, to, last, limit, cursor)"""
+    params = query_params(query)
+    return (
+        parse_query_metals(params.get('metal')),
+        *parse_query_range(params),
+        parse_query_count(params['last'], 'last') if 'last' in params else None,
+        parse_query_count(params['limit'], 'limit') if 'limit' in params else None,
+        parse_query_date(params['cursor'], 'cursor') if 'cursor' in params else None,
+    )
+
+
+def query_history(history, metals, first_day, last_day, last, limit, cursor):
+    """Срезы PriceSeries по металлам и курсор следующей страницы.
+
+    Фильтры применяются по порядку: from/to, last=N, cursor (дни строго
+    после него), limit. Страница обрезается по одной дате для всех металлов,
+    поэтому next_cursor (последний день страницы) продолжает все сразу.
+    """
+    empty = PriceSeries((), ())
+    pages = {}
+    for name in metals:
+        series = history.get(name, empty)
+        if first_day is not None:
+            series = series.since(first_day)
+        if last_day is not None:
+            series = series.until(last_day)
+        if last is not None:
+            series = series.last(last)
+        if cursor is not None:
+            series = series.after(cursor)
+        pages[name] = series
+    next_cursor = None
+    if limit is not None:
+        overflow = [int(series.days[limit - 1]) for series in pages.values() if len(series) > limit]
+        if overflow:
+            next_cursor = min(overflow)
+            pages = {name: series.until(next_cursor) for name, series in pages.items()}
+    return pages, next_cursor
+
+
+def cached_query_response(cache_name, key, build):
+    """Ответ на отфильтрованный запрос; одинаковые запросы до обновления данных берутся из кэша.
+
+    build(history, full_history) строит тело ответа по одному снимку данных;
+    error и last_successful_data_update добавляются из того же снимка.
+    """
+    with metals_data_lock:
+        cache = query_caches[cache_name]
+        prepared = cache.get(key)
+        history, full_history = historical_metals_data_cache, indicator_history
+        error, updated = parsing_error_message, last_successful_update_time
+    if prepared is not None:
+        return prepared
+    response_data = build(history, full_history)
+    response_data.update({"error": error, "last_successful_data_update": updated})
+    prepared = PreparedResponse(response_data)
+    with metals_data_lock:
+        # Кэш мог смениться после обновления данных - тогда ответ просто не сохранится в новом
+        if len(cache) >= MAX_CACHED_HISTORY_QUERIES:
+            cache.clear()
+        cache[key] = prepared
+    return prepared
+
+
+def history_query_response(query):
+    """Отфильтрованный ответ /api/historical_metals"""
+    key = parse_history_query(query)
+
+    def build(history, full_history):
+        pages, next_cursor = query_history(history, *key)
+        return {
+            "data": {name: series.to_records() for name, series in pages.items()},
+            "next_cursor": datetime.fromordinal(next_cursor).strftime('%Y-%m-%d') if next_cursor else None
+        }
+
+    return cached_query_response('history', key, build)
+
+
+def parse_indicator_query(query):
+    """Строка запроса /api/indicators -> нормализованный кортеж (металлы, window, from, to, last)"""
+    params = query_params(query)
+    return (
+        parse_query_metals(params.get('metal')),
+        parse_query_bounded(params, 'window', 2, MAX_INDICATOR_WINDOW),
+        *parse_query_range(params),
+        parse_query_count(params['last'], 'last') if 'last' in params else None,
+    )
+
+
+def indicator_periods(window):
+    """Периоды индикаторов: стандартные или window для всех, кроме MACD"""
+    if window is None:
+        return dict(DEFAULT_PERIODS)
+    return {kind: period if kind == 'macd' else window for kind, period in DEFAULT_PERIODS.items()}
+
+
+def json_values(values):
+    """Массив индикатора -> список для JSON: NaN (данных меньше периода) -> null"""
+    return [None if value != value else value for value in np.round(values, 4).tolist()]
+
+
+def indicator_query_response(query):
+    """Ответ /api/indicators; индикаторы считаются по всей истории, from/to/last только выбирают дни.
+
+    Без from и last отдаются те же дни, что в /api/historical_metals.
+    """
+    key = parse_indicator_query(query)
+    metals, window, first_day, last_day, last = key
+    periods = indicator_periods(window)
+
+    def build(history, full_history):
+        empty = PriceSeries((), ())
+        data = {}
+        for name in metals:
+            series = full_history.get(name, empty)
+            recent = history.get(name, empty)
+            since = first_day
+            if since is None and last is None and len(recent):
+                since = int(recent.days[0])
+            start = int(np.searchsorted(series.days, since)) if since is not None else 0
+            stop = int(np.searchsorted(series.days, last_day, side='right')) if last_day is not None else len(series)
+            if last is not None:
+                start = max(start, stop - last)
+            start = min(start, stop)
+            entry = {
+                "dates": [format_day(day) for day in series.days[start:stop].tolist()],
+                "price": series.prices[start:stop].tolist(),
+            }
+            for kind, period in periods.items():
+                column = indicator_engine.get(name, kind, period, series)
+                for output, values in column.outputs().items():
+                    entry[output] = json_values(values[start:stop])
+            data[name] = entry
+        return {"data": data, "periods": periods}
+
+    return cached_query_response('indicators', key, build)
+
+
+def parse_chart_query(query):
+    """Строка запроса /api/chart -> нормализованный кортеж (металлы, from, to, points)"""
+    params = query_params(query)
+    return (
+        parse_query_metals(params.get('metal')),
+        *parse_query_range(params),
+        parse_query_bounded(params, 'points', 3, MAX_CHART_POINTS, DEFAULT_CHART_POINTS),
+    )
+
+
+def chart_query_response(query):
+    """Ответ /api/chart: цены за период, прореженные LTTB до points точек"""
+    key = parse_chart_query(query)
+    metals, first_day, last_day, points = key
+
+    def build(history, full_history):
+        empty = PriceSeries((), ())
+        data = {}
+        for name in metals:
+            series = history.get(name, empty)
+            if first_day is not None:
+                series = series.since(first_day)
+            if last_day is not None:
+                series = series.until(last_day)
+            index = lttb_indices(series.days, series.prices, points)
+            data[name] = {
+                "dates": [format_day(day) for day in series.days[index].tolist()],
+                "prices": series.prices[index].tolist(),
+                "total": len(series)
+            }
+        return {"data": data, "points": points}
+
+    return cached_query_response('chart', key, build)
+
+
+def publish_responses():
+    publish_metals_response()
+    publish_history_response()
+
+
+def update_latest_prices(history):
+    """Последние цены в metals_cache; вызывать под metals_data_lock"""
+    for metal_entry in metals_cache:
+        series = history.get(metal_entry["name"])
+        if series is not None and len(series):
+            metal_entry["date"], metal_entry["price"] = series.latest()
+
+
+def history_first_day(now):
+    """Первый день, который держится в памяти: HISTORY_DAYS дней до now, не включая день отсечки"""
+    return (now - timedelta(days=HISTORY_DAYS)).toordinal() + 1
+
+
+def load_history_from_store():
+    """Заполняет кэши историей с диска; возвращает число загруженных записей"""
+    global historical_metals_data_cache, indicator_history
+    stored = history_store.load()
+    full_history = {name: PriceSeries.from_rows(stored.get(name, [])) for name in METAL_CODES.values()}
+    first_day = history_first_day(datetime.now())
+    history = {name: series.since(first_day) for name, series in full_history.items()}
+    with metals_data_lock:
+        historical_metals_data_cache = history
+        indicator_history = full_history
+        update_latest_prices(history)
+    indicator_engine.update(full_history)
+    publish_responses()
+    return sum(len(series) for series in history.values())
+
+
+def save_history_to_store(new_rows):
+    if history_store is None:
+        return
+    try:
+        history_store.save(new_rows)
+    except sqlite3.Error as e:
+        # Данные уже в памяти; недостающие на диске дни догрузятся из ЦБ после перезапуска
+        print(f"Не удалось сохранить историю в {history_store.path}: {e}", file=sys.stderr)
+
+
 def fetch_and_update_metal_prices():
-    global metals_cache, historical_metals_data_cache, last_successful_update_time, parsing_error_message
+    """Запрашивает у ЦБ только дни начиная с последней известной даты и дописывает их в кэш.
+
+    Последний известный день запрашивается повторно: ЦБ может уточнить цену.
+    Возвращает True, если обновление прошло успешно.
+    """
+    global metals_cache, historical_metals_data_cache, indicator_history, last_successful_update_time, parsing_error_message
     
     try:
         end_date = datetime.now()
-        start_date = end_date - timedelta(days=365)
+        first_day = history_first_day(end_date)
+        with metals_data_lock:
+            known_days = [int(series.days[-1]) for series in historical_metals_data_cache.values() if len(series)]
+        # С самой ранней из последних дат, чтобы догнать металл, который отстал
+        if len(known_days) == len(METAL_CODES):
+            start_date = datetime.fromordinal(max(min(known_days), first_day))
+        else:
+            start_date = datetime.fromordinal(first_day)
         
         params = {
             'date_req1': start_date.strftime('%d/%m/%Y'),
             'date_req2': end_date.strftime('%d/%m/%Y')
         }
         
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
-        
-        response = requests.get(CBR_URL, params=params, headers=headers, timeout=10)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.content, 'xml')
-        
-        temp_historical_data = {
-            "Золото": [], "Серебро": [], "Платина": [], "Палладий": []
-        }
-        
-        metal_codes = {
-            '1': "Золото",
-            '2': "Серебро",
-            '3': "Платина",
-            '4': "Палладий"
-        }
-        
-        latest_prices = {name: {"price": "N/A", "date": "N/A"} for name in metal_codes.values()}
-        
-        for record in soup.find_all('Record'):
-            try:
-                date = record['Date']
-                code = record['Code']
-                if code not in metal_codes:
-                    continue
-                    
-                metal_name = metal_codes[code]
-                buy_price = float(record.find('Buy').text.replace(',', '.'))
-                
-                temp_historical_data[metal_name].append({
-                    "date": date,
-                    "price": str(buy_price)
-                })
-                
-                record_date = datetime.strptime(date, '%d.%m.%Y')
-                latest_date = datetime.strptime(latest_prices[metal_name]["date"], '%d.%m.%Y') if latest_prices[metal_name]["date"] != "N/A" else datetime.min
-                
-                if record_date > latest_date:
-                    latest_prices[metal_name] = {
-                        "price": str(buy_price),
-                        "date": date
-                    }
-                    
-            except Exception as e:
-                continue
+        # Ответ разбирается по мере чтения, целиком в памяти он не хранится
+        with cbr_upstream.get(CBR_URL, params=params, stream=True) as response:
+            response.raise_for_status()
+            new_series = parse_metal_prices(response.iter_content(CBR_CHUNK_SIZE), METAL_CODES)
         
         with metals_data_lock:
-            for metal_entry in metals_cache:
-                name = metal_entry["name"]
-                if name in latest_prices:
-                    metal_entry["price"] = latest_prices[name]["price"]
-                    metal_entry["date"] = latest_prices[name]["date"]
+            empty = PriceSeries((), ())
+            merged = {
+                name: historical_metals_data_cache.get(name, empty).merge(series, first_day)
+                for name, series in new_series.items()
+            }
+            full_history = {
+                name: indicator_history.get(name, empty).merge(series)
+                for name, series in new_series.items()
+            }
+            update_latest_prices(merged)
             
-            historical_metals_data_cache = temp_historical_data
+            historical_metals_data_cache = merged
+            indicator_history = full_history
             last_successful_update_time = time.time()
             parsing_error_message = None
+        indicator_engine.update(full_history)
+        publish_responses()
+        save_history_to_store({
+            name: list(zip(series.days.tolist(), series.prices.tolist()))
+            for name, series in new_series.items()
+        })
+        return True
             
     except requests.exceptions.RequestException as e:
         parsing_error_message = f"Ошибка при запросе к ЦБ: {e}"
     except Exception as e:
         parsing_error_message = f"ошибка при парсинге данных ЦБ: {e}"
+    publish_responses()
+    return False
+
+
+def next_refresh_delay(failures):
+    """Обычный интервал после успеха; после ошибок - экспоненциальная пауза со случайным разбросом"""
+    if failures == 0:
+        return REFRESH_INTERVAL
+    delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (failures - 1))
+    # Половина паузы фиксирована, половина случайна: перезапущенные копии не ходят в ЦБ одновременно
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def refresh_loop(stop_event, first_delay):
+    global next_refresh_time, refresh_failures
+    delay = first_delay
+    while True:
+        next_refresh_time = time.time() + delay
+        publish_metals_response()
+        if stop_event.wait(delay):
+            return
+        if fetch_and_update_metal_prices():
+            refresh_failures = 0
+            refresh_forecast_snapshot()
+        else:
+            refresh_failures += 1
+        delay = next_refresh_delay(refresh_failures)
+
+
+def start_refresh_scheduler(first_delay):
+    stop_event = Event()
+    Thread(target=refresh_loop, args=(stop_event, first_delay), name="cbr-refresh", daemon=True).start()
+    return stop_event
+
+
+class ForecastError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class ForecastSnapshot:
+    """Готовые ответы /api/forecast/<код>, посчитанные по одной версии данных.
+
+    data_version - last_successful_update_time обновления, по которому снимок
+    построен; после следующего обновления снимок считается устаревшим.
+    """
+
+    def __init__(self, data_version, responses, errors):
+        self.data_version = data_version
+        # код металла -> PreparedResponse
+        self.responses = responses
+        # код металла -> почему прогноз не посчитан
+        self.errors = errors
+        self.built_at = time.time()
+
+
+def forecast_window(historical_data, now):
+    """(записи за последний месяц, 60 последних цен для модели) или ForecastError"""
+    if historical_data is None:
+        raise ForecastError(404, "Данные не найдены")
+    if not len(historical_data):
+        raise ForecastError(404, "Исторические данные отсутствуют")
+    # Дни строго позже (сейчас - 30 дней): то же, что сравнение полуночи дня с текущим временем
+    one_month_ago = now - timedelta(days=30)
+    filtered_data = historical_data.after(one_month_ago.toordinal())
+    if len(filtered_data) < 5:
+        raise ForecastError(400, "Недостаточно данных за последний месяц")
+    return filtered_data, historical_data.last(60).prices.tolist()
+
+
+def trend_emas(metal_name_ru, full_series):
+    """EMA7 и EMA21 на последний день, посчитанные по всей истории металла (indicator_history)"""
+    return tuple(
+        float(indicator_engine.get(metal_name_ru, 'ema', period, full_series).values['ema'][-1])
+        for period in (7, 21)
+    )
+
+
+def build_forecast_response(filtered_data, forecast, data_version, emas):
+    prices_month = filtered_data.prices.tolist()
+    current_price = prices_month[-1]
+    ema_7, ema_21 = emas
+    ema_diff = ema_7 - ema_21
+    
+    # Анализируем прогноз цены
+    forecast_prices = forecast[:7]
+    price_trend = forecast_prices[-1] - current_price
+    
+    # Определяем рекомендацию на основе обоих факторов
+    ema_signal = "BUY" if ema_diff > 0 else "SELL"
+    forecast_signal = "BUY" if price_trend > 0 else "SELL"
+    
+    if ema_signal == forecast_signal:
+        action = ema_signal
+       
+        ema_strength = min(abs(ema_diff) / current_price * 100, 100) / 100
+        forecast_strength = min(abs(price_trend) / current_price * 100, 100) / 100
+        confidence = (ema_strength + forecast_strength) / 2
+    else:
+        
+        action = forecast_signal
+       
+        confidence = min(abs(price_trend) / current_price * 100, 100) / 200
+
+    return {
+        "current_price": current_price,
+        "historical_data": filtered_data.to_records(),
+        "forecast_prices": forecast_prices,
+        "recommendation": {
+            "action": action,
+            "confidence": confidence
+        },
+        "indicators": {
+            "ema_7": ema_7,
+            "ema_21": ema_21,
+            "ema_diff": ema_diff
+        },
+        "last_successful_data_update": data_version
+    }
+
+
+def live_forecast(metal_code, historical_data):
+    """Прогноз по запросу: окно цен -> POST /forecast -> индикаторы и рекомендация"""
+    metal_name_en, metal_name_ru = METAL_MAPPING[metal_code]
+    with metals_data_lock:
+        data_version = last_successful_update_time
+        full_series = indicator_history.get(metal_name_ru)
+    try:
+        filtered_data, prices_for_ai = forecast_window(historical_data, datetime.now())
+        emas = trend_emas(metal_name_ru, full_series)
+        try:
+            response = ai_upstream.post(
+                f'{AI_SERVICE_URL}/forecast',
+                json={
+                    'metal': metal_name_en,
+                    'prices': prices_for_ai,
+                    'horizon': 7
+                }
+            )
+            response.raise_for_status()
+            return build_forecast_response(filtered_data, response.json()["forecast"], data_version, emas)
+        except requests.exceptions.RequestException as e:
+            raise ForecastError(500, f"Ошибка при запросе к ИИ сервису: {str(e)}")
+    except ForecastError:
+        raise
+    except Exception as e:
+        raise ForecastError(500, f"Ошибка при обработке данных: {str(e)}")
+
+
+def refresh_forecast_snapshot():
+    """Считает прогнозы всех металлов одним запросом к /forecast/batch и публикует снимок"""
+    global forecast_snapshot
+    with metals_data_lock:
+        history = historical_metals_data_cache
+        full_history = indicator_history
+        data_version = last_successful_update_time
+    now = datetime.now()
+    windows = {}
+    emas = {}
+    errors = {}
+    for metal_code, (metal_name_en, metal_name_ru) in METAL_MAPPING.items():
+        try:
+            windows[metal_code] = forecast_window(history.get(metal_name_ru), now)
+            emas[metal_code] = trend_emas(metal_name_ru, full_history[metal_name_ru])
+        except ForecastError as e:
+            errors[metal_code] = e.message
+
+    responses = {}
+    if windows:
+        payload = {'items': [
+            {'metal': METAL_MAPPING[metal_code][0], 'prices': prices_for_ai, 'horizon': 7}
+            for metal_code, (_, prices_for_ai) in windows.items()
+        ]}
+        try:
+            response = ai_upstream.post(f'{AI_SERVICE_URL}/forecast/batch', json=payload)
+            response.raise_for_status()
+            forecasts = response.json()["forecasts"]
+            for (metal_code, (filtered_data, _)), item in zip(windows.items(), forecasts):
+                responses[metal_code] = PreparedResponse(
+                    build_forecast_response(filtered_data, item["forecast"], data_version, emas[metal_code]))
+        except requests.exceptions.RequestException as e:
+            errors.update({metal_code: f"Ошибка при запросе к ИИ сервису: {e}" for metal_code in windows})
+        except (ValueError, KeyError, TypeError, IndexError) as e:
+            errors.update({metal_code: f"Ошибка при обработке данных: {e}" for metal_code in windows})
+
+    snapshot = ForecastSnapshot(data_version, responses, errors)
+    with metals_data_lock:
+        forecast_snapshot = snapshot
+    return snapshot
+
+
+# Ответы с пустыми данными, пока история не загружена
+publish_responses()
+
+
+class ThreadingServer(http.server.ThreadingHTTPServer):
+    """Каждое соединение в своем потоке, но не больше max_connections сразу"""
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, server_address, handler_class, max_connections=MAX_CONNECTIONS):
+        self.connection_slots = BoundedSemaphore(max_connections)
+        super().__init__(server_address, handler_class)
+
+    def process_request(self, request, client_address):
+        # Пока все слоты заняты, новые соединения ждут в очереди ядра
+        self.connection_slots.acquire()
+        try:
+            super().process_request(request, client_address)
+        except Exception:
+            self.connection_slots.release()
+            raise
+
+    def process_request_thread(self, request, client_address):
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            self.connection_slots.release()
+
 
 class Handler(http.server.SimpleHTTPRequestHandler):
+    # HTTP/1.1: соединение не закрывается после ответа, поэтому у каждого ответа должен быть Content-Length
+    protocol_version = 'HTTP/1.1'
+    timeout = KEEPALIVE_TIMEOUT
+    # Заголовки и тело уходят отдельными send: без TCP_NODELAY на keep-alive ответ ждет delayed ACK (~40 мс)
+    disable_nagle_algorithm = True
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, directory=WEB_DIR, **kwargs)
 
-    def do_GET(self):
-        if self.path == '/api/hello':
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.send_header('Access-Control-Allow-Origin', '*')
+    def send_json(self, data, status=200):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_error(self, code, message=None, explain=None):
+        # Строка статуса кодируется в latin-1, поэтому русский текст передаем только в теле
+        super().send_error(code, None, explain or message)
+
+    def send_prepared(self, prepared):
+        """Готовый ответ: 304 по If-None-Match, иначе вариант под Accept-Encoding"""
+        encoding = prepared.choose_encoding(self.headers.get('Accept-Encoding'))
+        if prepared.not_modified(self.headers.get('If-None-Match')):
+            self.send_response(304)
+            self.send_cache_headers(prepared.etags[encoding])
             self.end_headers()
-            response = {"message": "Hello from Python Backend!"}
-            self.wfile.write(json.dumps(response).encode('utf-8'))
+            return
+        body = prepared.bodies[encoding]
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        if encoding != 'identity':
+            self.send_header('Content-Encoding', encoding)
+        self.send_cache_headers(prepared.etags[encoding])
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_cache_headers(self, etag):
+        # no-cache: браузер хранит ответ, но каждый раз сверяет ETag
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Vary', 'Accept-Encoding')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Expose-Headers', 'ETag')
+
+    def do_GET(self):
+        path, _, query = self.path.partition('?')
+        if path == '/api/hello':
+            self.send_json({"message": "Hello from Python Backend!"})
             return
             
-        elif self.path == '/api/metals':
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.end_headers()
+        elif path == '/api/upstreams':
+            # Счетчики запросов, ошибок и задержек к ЦБ и сервису прогнозов
+            self.send_json({upstream.name: upstream.stats() for upstream in (cbr_upstream, ai_upstream)})
+            return
             
-            with metals_data_lock:
-                response_data = {
-                    "data": metals_cache,
-                    "error": parsing_error_message,
-                    "last_successful_data_update": last_successful_update_time
-                }
-            self.wfile.write(json.dumps(response_data).encode('utf-8'))
+        elif path == '/api/metals':
+            self.send_prepared(metals_response)
             return
             
-        elif self.path == '/api/historical_metals':
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.end_headers()
+        elif path == '/api/historical_metals':
+            # metal, from, to, last, limit, cursor; без параметров - вся история
+            if not query:
+                self.send_prepared(historical_response)
+                return
+            try:
+                prepared = history_query_response(query)
+            except HistoryQueryError as e:
+                self.send_error(400, str(e))
+                return
+            self.send_prepared(prepared)
+            return
             
-            with metals_data_lock:
-                response_data_hist = {
-                    "data": historical_metals_data_cache,
-                    "error": parsing_error_message,
-                    "last_successful_data_update": last_successful_update_time
-                }
-            self.wfile.write(json.dumps(response_data_hist).encode('utf-8'))
+        elif path == '/api/indicators':
+            # metal, window (период индикаторов), from, to, last
+            try:
+                prepared = indicator_query_response(query)
+            except HistoryQueryError as e:
+                self.send_error(400, str(e))
+                return
+            self.send_prepared(prepared)
             return
             
-        elif self.path.startswith('/api/forecast/'):
-            metal_code = self.path.split('/')[-1]
-            metal_mapping = {
-                'Au': ('gold', 'Золото'),
-                'Ag': ('silver', 'Серебро'),
-                'Pt': ('platinum', 'Платина'),
-                'Pd': ('palladium', 'Палладий')
-            }
+        elif path == '/api/chart':
+            # metal, from, to, points - ряд для графика не длиннее points точек
+            try:
+                prepared = chart_query_response(query)
+            except HistoryQueryError as e:
+                self.send_error(400, str(e))
+                return
+            self.send_prepared(prepared)
+            return
             
-            if metal_code not in metal_mapping:
+        elif path.startswith('/api/forecast/'):
+            metal_code = path.split('/')[-1]
+            if metal_code not in METAL_MAPPING:
                 self.send_error(400, "ошибка кода")
                 return
 
-            metal_name_en, metal_name_ru = metal_mapping[metal_code]
-            
+            metal_name_ru = METAL_MAPPING[metal_code][1]
+            # Под блокировкой только читаем ссылки: ответ клиенту может писаться долго
             with metals_data_lock:
-                if metal_name_ru not in historical_metals_data_cache:
-                    self.send_error(404, "Данные не найдены")
-                    return
-                
-                historical_data = historical_metals_data_cache[metal_name_ru]
-                if not historical_data:
-                    self.send_error(404, "Исторические данные отсутствуют")
-                    return
+                snapshot = forecast_snapshot
+                snapshot_is_current = snapshot is not None and snapshot.data_version == last_successful_update_time
+                historical_data = historical_metals_data_cache.get(metal_name_ru)
 
-            try:
-                sorted_data = sorted(
-                    historical_data,
-                    key=lambda x: datetime.strptime(x['date'], '%d.%m.%Y')
-                )
-                
-                one_month_ago = datetime.now() - timedelta(days=30)
-                filtered_data = [
-                    entry for entry in sorted_data
-                    if datetime.strptime(entry['date'], '%d.%m.%Y') >= one_month_ago
-                ]
-                
-                if len(filtered_data) < 5:
-                    self.send_error(400, "Недостаточно данных за последний месяц")
-                    return
+            prepared = snapshot.responses.get(metal_code) if snapshot_is_current else None
+            if prepared is not None:
+                self.send_prepared(prepared)
+                return
 
-                prices_for_ai = [float(entry['price']) for entry in sorted_data[-60:]]
-                
-                try:
-                    response = requests.post(
-                        'http://localhost:8001/forecast',
-                        json={
-                            'metal': metal_name_en,
-                            'prices': ','.join(map(str, prices_for_ai))
-                        }
-                    )
-                    response.raise_for_status()
-                    forecast_data = response.json()
-
-                    current_price = float(filtered_data[-1]['price'])
-                    prices_month = [float(entry['price']) for entry in filtered_data]
-                    ema_7 = sum(prices_month[-7:]) / 7 if len(prices_month) >= 7 else current_price
-                    ema_21 = sum(prices_month[-21:]) / 21 if len(prices_month) >= 21 else current_price
-                    ema_diff = ema_7 - ema_21
-                    
-                    # Анализируем прогноз цены
-                    forecast_prices = forecast_data["forecast"][:7]
-                    price_trend = forecast_prices[-1] - current_price
-                    
-                    # Определяем рекомендацию на основе обоих факторов
-                    ema_signal = "BUY" if ema_diff > 0 else "SELL"
-                    forecast_signal = "BUY" if price_trend > 0 else "SELL"
-                    
-                    if ema_signal == forecast_signal:
-                        action = ema_signal
-                       
-                        ema_strength = min(abs(ema_diff) / current_price * 100, 100) / 100
-                        forecast_strength = min(abs(price_trend) / current_price * 100, 100) / 100
-                        confidence = (ema_strength + forecast_strength) / 2
-                    else:
-                        
-                        action = forecast_signal
-                       
-                        confidence = min(abs(price_trend) / current_price * 100, 100) / 200
-
-                    response_data = {
-                        "current_price": current_price,
-                        "historical_data": filtered_data,
-                        "forecast_prices": forecast_prices,
-                        "recommendation": {
-                            "action": action,
-                            "confidence": confidence
-                        },
-                        "indicators": {
-                            "ema_7": ema_7,
-                            "ema_21": ema_21,
-                            "ema_diff": ema_diff
-                        }
-                    }
-
-                    self.send_response(200)
-                    self.send_header('Content-type', 'application/json')
-                    self.send_header('Access-Control-Allow-Origin', '*')
-                    self.end_headers()
-                    self.wfile.write(json.dumps(response_data).encode('utf-8'))
-                    return
-
-                except requests.exceptions.RequestException as e:
-                    self.send_error(500, f"Ошибка при запросе к ИИ сервису: {str(e)}")
-                    return
-                    
-            except Exception as e:
-                self.send_error(500, f"Ошибка при обработке данных: {str(e)}")
+            # Снимка нет (сервис прогнозов был недоступен при обновлении) - считаем как раньше, по запросу
+            try:
+                response_data = live_forecast(metal_code, historical_data)
+            except ForecastError as e:
+                self.send_error(e.status, e.message)
                 return
+            self.send_json(response_data)
+            return
                 
         return super().do_GET()
 
-fetch_and_update_metal_prices()
+if __name__ == '__main__':
+    # История с диска доступна сразу, недостающие дни догружаются в фоне
+    history_store = HistoryStore(HISTORY_DB_PATH)
+    load_history_from_store()
+    start_refresh_scheduler(0)
 
-with socketserver.TCPServer(("", PORT), Handler) as httpd:
-    httpd.serve_forever() 
\ No newline at end of file
+    with ThreadingServer(("", PORT), Handler, MAX_CONNECTIONS) as httpd:
+        httpd.serve_forever()
+ 
\ No newline at end of file
@@ -0,0 +1,55 @@
+import gzip
+import hashlib
+import json
+
+try:
+    import brotli
+except ImportError:
+    # brotli необязателен: без него отдаем gzip
+    brotli = None
+
+
+class PreparedResponse:
+    """JSON-ответ, сериализованный и сжатый заранее, с сильным ETag.
+
+    Строится один раз при обновлении данных; обработчик запроса только
+    выбирает готовые байты под Accept-Encoding или отвечает 304.
+    """
+
+    def __init__(self, data):
+        body = json.dumps(data).encode('utf-8')
+        self.bodies = {'identity': body, 'gzip': gzip.compress(body, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            self.bodies['br'] = brotli.compress(body)
+        digest = hashlib.blake2b(body, digest_size=12).hexdigest()
+        # Разные байты - разные ETag: у сжатых вариантов свой суффикс
+        self.etags = {
+            encoding: f'"{digest}"' if encoding == 'identity' else f'"{digest}-{encoding}"'
+            for encoding in self.bodies
+        }
+
+    def not_modified(self, if_none_match):
+        """True, если у клиента уже есть один из вариантов этого ответа"""
+        if not if_none_match:
+            return False
+        tags = {tag.strip() for tag in if_none_match.split(',')}
+        return '*' in tags or not tags.isdisjoint(self.etags.values())
+
+    def choose_encoding(self, accept_encoding):
+        """Лучшее из доступных сжатий, которое клиент принимает (q > 0)"""
+        accepted = {}
+        for item in (accept_encoding or '').split(','):
+            name, _, params = item.strip().partition(';')
+            quality = 1.0
+            params = params.strip()
+            if params.startswith('q='):
+                try:
+                    quality = float(params[2:])
+                except ValueError:
+                    quality = 0.0
+            if name:
+                accepted[name.lower()] = quality
+        for encoding in ('br', 'gzip'):
+            if encoding in self.bodies and accepted.get(encoding, accepted.get('*', 0)) > 0:
+                return encoding
+        return 'identity'
@@ -0,0 +1,88 @@
+from datetime import datetime
+
+import numpy as np
+
+DATE_FORMAT = '%d.%m.%Y'
+
+
+def format_day(day):
+    return datetime.fromordinal(int(day)).strftime(DATE_FORMAT)
+
+
+class PriceSeries:
+    """История одного металла: отсортированные параллельные массивы дней и цен.
+
+    days - порядковые номера дат (date.toordinal(), int64), prices - float64.
+    Объект не меняется после создания: обновление строит новый, поэтому его
+    можно отдавать из-под блокировки и читать из нескольких потоков.
+    """
+
+    __slots__ = ('days', 'prices', '_records')
+
+    def __init__(self, days, prices):
+        self.days = np.asarray(days, dtype=np.int64)
+        self.prices = np.asarray(prices, dtype=np.float64)
+        self._records = None
+
+    @classmethod
+    def from_rows(cls, rows):
+        """[(день, цена), ...] в любом порядке; при повторе дня побеждает последняя запись"""
+        if not rows:
+            return cls((), ())
+        days, prices = zip(*rows)
+        return cls.from_arrays(days, prices)
+
+    @classmethod
+    def from_arrays(cls, days, prices):
+        """Параллельные массивы в любом порядке; при повторе дня побеждает последняя запись"""
+        days = np.asarray(days, dtype=np.int64)
+        prices = np.asarray(prices, dtype=np.float64)
+        if len(days) and np.all(days[1:] > days[:-1]):
+            # Обычный случай: ЦБ отдает дни по возрастанию без повторов
+            return cls(days, prices)
+        return cls((), ()).merge(cls(days[::-1], prices[::-1]))
+
+    def __len__(self):
+        return len(self.days)
+
+    def merge(self, other, cutoff=None):
+        """Новая серия с днями other (они заменяют совпавшие) без дней раньше cutoff"""
+        all_days = np.concatenate([other.days, self.days])
+        all_prices = np.concatenate([other.prices, self.prices])
+        # return_index дает первое вхождение, а записи other стоят первыми
+        unique_days, index = np.unique(all_days, return_index=True)
+        merged = PriceSeries(unique_days, all_prices[index])
+        return merged.since(cutoff) if cutoff is not None else merged
+
+    def since(self, day):
+        """Дни начиная с day включительно"""
+        return self._slice(np.searchsorted(self.days, day, side='left'), len(self.days))
+
+    def after(self, day):
+        """Дни строго позже day"""
+        return self._slice(np.searchsorted(self.days, day, side='right'), len(self.days))
+
+    def until(self, day):
+        """Дни не позже day"""
+        return self._slice(0, np.searchsorted(self.days, day, side='right'))
+
+    def last(self, count):
+        return self._slice(max(0, len(self.days) - count), len(self.days))
+
+    def _slice(self, start, stop):
+        if start == 0 and stop == len(self.days):
+            return self
+        return PriceSeries(self.days[start:stop], self.prices[start:stop])
+
+    def latest(self):
+        """(дата 'дд.мм.гггг', цена строкой) последнего дня"""
+        return format_day(self.days[-1]), str(float(self.prices[-1]))
+
+    def to_records(self):
+        """[{"date": "дд.мм.гггг", "price": "..."}] - формат ответов API; строится один раз"""
+        if self._records is None:
+            self._records = [
+                {"date": format_day(day), "price": str(price)}
+                for day, price in zip(self.days.tolist(), self.prices.tolist())
+            ]
+        return self._records
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Модули бэкенда импортируют друг друга без пакета, как при запуске python main.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
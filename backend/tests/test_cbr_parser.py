@@ -0,0 +1,64 @@
+import os
+import xml.etree.ElementTree as ET
+from datetime import date
+
+import numpy as np
+import pytest
+
+from cbr_parser import day_ordinal, parse_metal_prices
+
+METAL_CODES = {'1': 'Золото', '2': 'Серебро', '3': 'Платина', '4': 'Палладий'}
+FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures', 'xml_metall.xml')
+
+
+@pytest.fixture
+def content():
+    with open(FIXTURE, 'rb') as f:
+        return f.read()
+
+
+def test_parses_buy_prices_per_metal(content):
+    history = parse_metal_prices(content, METAL_CODES)
+    assert set(history) == set(METAL_CODES.values())
+    gold = history['Золото']
+    assert gold.days.tolist() == [date(2024, 1, day).toordinal() for day in (9, 10, 11, 12)]
+    assert gold.prices.tolist() == [5943.78, 5976.2, 5938.11, 5989.43]
+    assert history['Серебро'].prices.tolist() == [70.63, 71.05, 70.41, 71.27]
+
+
+def test_matches_beautifulsoup_parse(content):
+    pytest.importorskip('bs4')
+    pytest.importorskip('lxml')
+    from bench_cbr_parser import parse_with_soup
+
+    streaming = parse_metal_prices(content, METAL_CODES)
+    soup = parse_with_soup(content)
+    for name in METAL_CODES.values():
+        np.testing.assert_array_equal(streaming[name].days, soup[name].days)
+        np.testing.assert_array_equal(streaming[name].prices, soup[name].prices)
+
+
+def test_chunked_input_gives_same_result(content):
+    whole = parse_metal_prices(content, METAL_CODES)
+    chunks = (content[i:i + 7] for i in range(0, len(content), 7))
+    chunked = parse_metal_prices(chunks, METAL_CODES)
+    for name in METAL_CODES.values():
+        np.testing.assert_array_equal(chunked[name].days, whole[name].days)
+        np.testing.assert_array_equal(chunked[name].prices, whole[name].prices)
+
+
+def test_unknown_codes_only_are_ignored(content):
+    history = parse_metal_prices(content, {'1': 'Золото'})
+    assert list(history) == ['Золото']
+    assert len(history['Золото']) == 4
+
+
+def test_truncated_response_raises(content):
+    with pytest.raises(ET.ParseError):
+        parse_metal_prices(content[:len(content) // 2], METAL_CODES)
+
+
+def test_day_ordinal():
+    assert day_ordinal('29.02.2024') == date(2024, 2, 29).toordinal()
+    with pytest.raises(ValueError):
+        day_ordinal('31.02.2024')
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from downsample import lttb_indices
+
+
+def lttb_reference(x, y, points):
+    """Исходный алгоритм LTTB (Steinarsson) циклом по точкам"""
+    n = len(x)
+    every = (n - 2) / (points - 2)
+    selected = [0]
+    a = 0
+    for i in range(points - 2):
+        next_start = int((i + 1) * every) + 1
+        next_stop = min(int((i + 2) * every) + 1, n)
+        if next_stop > next_start:
+            avg_x, avg_y = np.mean(x[next_start:next_stop]), np.mean(y[next_start:next_stop])
+        else:
+            avg_x, avg_y = x[-1], y[-1]
+        best_area, best = -1.0, None
+        for j in range(int(i * every) + 1, int((i + 1) * every) + 1):
+            area = abs((x[a] - avg_x) * (y[j] - y[a]) - (x[a] - x[j]) * (avg_y - y[a]))
+            if area > best_area:
+                best_area, best = area, j
+        selected.append(best)
+        a = best
+    selected.append(n - 1)
+    return selected
+
+
+def random_walk(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.arange(n, dtype=float) + 738000, 5000 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+
+
+@pytest.mark.parametrize('n, points', [(10, 3), (100, 7), (1000, 250), (3650, 500), (1000, 999)])
+def test_matches_reference(n, points):
+    x, y = random_walk(n)
+    assert lttb_indices(x, y, points).tolist() == lttb_reference(x, y, points)
+
+
+@pytest.mark.parametrize('n, points', [(100, 10), (3650, 500), (7301, 800)])
+def test_keeps_endpoints_and_point_count(n, points):
+    x, y = random_walk(n)
+    index = lttb_indices(x, y, points)
+    assert len(index) == points
+    assert index[0] == 0 and index[-1] == n - 1
+    assert (np.diff(index) > 0).all()
+
+
+def test_one_point_per_bucket():
+    n, points = 1000, 52
+    x, y = random_walk(n)
+    index = lttb_indices(x, y, points)
+    edges = (np.arange(points - 1) * (n - 2) / (points - 2)).astype(int) + 1
+    buckets = np.searchsorted(edges, index[1:-1], side='right') - 1
+    assert buckets.tolist() == list(range(points - 2))
+
+
+def test_keeps_spike():
+    x = np.arange(1000, dtype=float)
+    y = np.zeros(1000)
+    y[437] = 100.0
+    assert 437 in lttb_indices(x, y, 20).tolist()
+
+
+@pytest.mark.parametrize('n, points', [(0, 5), (5, 5), (5, 10), (50, 2)])
+def test_short_series_returned_whole(n, points):
+    x, y = random_walk(n)
+    assert lttb_indices(x, y, points).tolist() == list(range(n))
@@ -0,0 +1,68 @@
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from http_client import PoolTimeout, Upstream
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        status = 503 if self.path == '/busy' else 200
+        body = b'x' * 1000
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{httpd.server_port}'
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def closed_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def test_retries_before_final_error_are_counted():
+    upstream = Upstream('test', retries=2, backoff=0, connect_timeout=1)
+    with pytest.raises(requests.exceptions.ConnectionError):
+        upstream.get(f'http://127.0.0.1:{closed_port()}/')
+    stats = upstream.stats()
+    assert stats['retries'] == 2
+    assert stats['errors'] == {'connection': 1}
+    assert stats['in_flight'] == 0
+
+
+def test_status_retries_are_counted(server):
+    upstream = Upstream('test', retries=2, backoff=0)
+    assert upstream.get(f'{server}/busy').status_code == 503
+    stats = upstream.stats()
+    assert stats['retries'] == 2
+    assert stats['statuses'] == {'503': 1}
+
+
+def test_streamed_response_holds_slot_until_closed(server):
+    upstream = Upstream('test', max_connections=1, pool_timeout=0.1)
+    with upstream.get(f'{server}/', stream=True) as response:
+        assert upstream.stats()['requests'] == 0
+        with pytest.raises(PoolTimeout):
+            upstream.get(f'{server}/')
+        assert len(response.content) == 1000
+    stats = upstream.stats()
+    assert stats['statuses'] == {'200': 1}
+    assert stats['errors'] == {'pool_timeout': 1}
+    assert upstream.get(f'{server}/').status_code == 200
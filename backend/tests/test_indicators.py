@@ -0,0 +1,98 @@
+import numpy as np
+import pytest
+
+from indicators import DEFAULT_PERIODS, IndicatorColumn, ewm, rsi
+from price_series import PriceSeries
+
+FIRST_DAY = 738000
+
+
+def random_walk(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return 5000 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+
+
+def series(prices, first_day=FIRST_DAY):
+    return PriceSeries(np.arange(first_day, first_day + len(prices)), prices)
+
+
+def ema_reference(prices, period):
+    k = 2 / (period + 1)
+    out = [prices[0]]
+    for price in prices[1:]:
+        out.append(price * k + out[-1] * (1 - k))
+    return np.array(out)
+
+
+def rsi_reference(prices, period):
+    changes = np.diff(prices)
+    gains, losses = np.maximum(changes, 0), np.maximum(-changes, 0)
+    avg_gain, avg_loss = gains[:period].mean(), losses[:period].mean()
+    out = [np.nan] * period + [100 - 100 / (1 + avg_gain / avg_loss)]
+    for gain, loss in zip(gains[period:], losses[period:]):
+        avg_gain = (avg_gain * (period - 1) + gain) / period
+        avg_loss = (avg_loss * (period - 1) + loss) / period
+        out.append(100 - 100 / (1 + avg_gain / avg_loss))
+    return np.array(out)
+
+
+@pytest.mark.parametrize('period', [2, 7, 21, 200])
+def test_ewm_matches_loop(period):
+    prices = random_walk(1000)
+    np.testing.assert_allclose(ewm(prices, 2 / (period + 1)), ema_reference(prices, period), rtol=1e-12)
+
+
+def test_ewm_continues_from_initial_state():
+    prices = random_walk(300)
+    full = ewm(prices, 0.1)
+    np.testing.assert_allclose(ewm(prices[100:], 0.1, full[99]), full[100:], rtol=1e-12)
+
+
+def test_rsi_matches_wilder_reference():
+    prices = random_walk(500)
+    values = rsi(prices, 0, 14, None)['rsi']
+    np.testing.assert_allclose(values, rsi_reference(prices, 14), rtol=1e-10)
+    assert np.isnan(values[:14]).all()
+
+
+def test_rsi_flat_prices_is_neutral():
+    values = rsi(np.full(30, 100.0), 0, 14, None)['rsi']
+    assert (values[14:] == 50).all()
+
+
+def assert_same_column(actual, expected):
+    assert actual.values.keys() == expected.values.keys()
+    for name in expected.values:
+        np.testing.assert_allclose(actual.values[name], expected.values[name], rtol=1e-10, equal_nan=True)
+
+
+@pytest.mark.parametrize('kind', list(DEFAULT_PERIODS))
+def test_extend_equals_fresh_compute_after_append(kind):
+    period = DEFAULT_PERIODS[kind]
+    prices = random_walk(400)
+    revised = prices.copy()
+    # Последний известный день уточнился и добавились новые дни
+    revised[299] *= 1.01
+    old = IndicatorColumn.compute(kind, period, series(prices[:300]))
+    new_series = series(revised[:305])
+    assert_same_column(old.extend(new_series), IndicatorColumn.compute(kind, period, new_series))
+
+
+@pytest.mark.parametrize('kind', list(DEFAULT_PERIODS))
+def test_extend_equals_fresh_compute_after_trim(kind):
+    period = DEFAULT_PERIODS[kind]
+    prices = random_walk(400)
+    old = IndicatorColumn.compute(kind, period, series(prices[:300]))
+    # Окно истории сдвинулось: старые дни срезаны, новые добавлены
+    new_series = series(prices[5:305], FIRST_DAY + 5)
+    assert_same_column(old.extend(new_series), IndicatorColumn.compute(kind, period, new_series))
+
+
+@pytest.mark.parametrize('length', [0, 1, 5, 15, 30])
+def test_short_series_keep_length(length):
+    prices = random_walk(length + 1)
+    for kind, period in DEFAULT_PERIODS.items():
+        column = IndicatorColumn.compute(kind, period, series(prices[:length]))
+        assert all(len(values) == length for values in column.values.values())
+        extended = column.extend(series(prices))
+        assert all(len(values) == length + 1 for values in extended.values.values())
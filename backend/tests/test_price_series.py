@@ -0,0 +1,66 @@
+from datetime import date
+
+import numpy as np
+
+from price_series import PriceSeries, format_day
+
+DAY = date(2024, 1, 10).toordinal()
+
+
+def test_merge_overlap_takes_new_prices():
+    old = PriceSeries([DAY, DAY + 1, DAY + 2], [1.0, 2.0, 3.0])
+    new = PriceSeries([DAY + 2, DAY + 3], [30.0, 4.0])
+    merged = old.merge(new)
+    assert merged.days.tolist() == [DAY, DAY + 1, DAY + 2, DAY + 3]
+    assert merged.prices.tolist() == [1.0, 2.0, 30.0, 4.0]
+
+
+def test_merge_drops_days_before_cutoff():
+    old = PriceSeries([DAY, DAY + 1, DAY + 2], [1.0, 2.0, 3.0])
+    merged = old.merge(PriceSeries([DAY + 3], [4.0]), cutoff=DAY + 2)
+    assert merged.days.tolist() == [DAY + 2, DAY + 3]
+    assert merged.prices.tolist() == [3.0, 4.0]
+
+
+def test_merge_keeps_original_unchanged():
+    old = PriceSeries([DAY, DAY + 1], [1.0, 2.0])
+    old.merge(PriceSeries([DAY + 1], [20.0]))
+    assert old.prices.tolist() == [1.0, 2.0]
+
+
+def test_from_rows_sorts_and_last_duplicate_wins():
+    series = PriceSeries.from_rows([(DAY + 1, 2.0), (DAY, 1.0), (DAY + 1, 5.0)])
+    assert series.days.tolist() == [DAY, DAY + 1]
+    assert series.prices.tolist() == [1.0, 5.0]
+
+
+def test_from_arrays_sorted_input_is_kept_as_is():
+    series = PriceSeries.from_arrays(np.array([DAY, DAY + 1]), np.array([1.0, 2.0]))
+    assert series.days.tolist() == [DAY, DAY + 1]
+    assert series.prices.tolist() == [1.0, 2.0]
+
+
+def test_slices():
+    series = PriceSeries(np.arange(DAY, DAY + 5), np.arange(5, dtype=float))
+    assert series.since(DAY + 3).days.tolist() == [DAY + 3, DAY + 4]
+    assert series.after(DAY + 3).days.tolist() == [DAY + 4]
+    assert series.until(DAY + 1).days.tolist() == [DAY, DAY + 1]
+    assert series.last(2).days.tolist() == [DAY + 3, DAY + 4]
+    assert len(series.last(10)) == 5
+
+
+def test_records_and_latest():
+    series = PriceSeries([DAY, DAY + 1], [7008.81, 6999.5])
+    assert series.to_records() == [
+        {"date": "10.01.2024", "price": "7008.81"},
+        {"date": "11.01.2024", "price": "6999.5"},
+    ]
+    assert series.latest() == ("11.01.2024", "6999.5")
+    assert format_day(DAY) == "10.01.2024"
+
+
+def test_empty_series():
+    empty = PriceSeries.from_rows([])
+    assert len(empty) == 0
+    assert len(empty.merge(PriceSeries((), ()))) == 0
+    assert empty.to_records() == []
@@ -1,10 +1,12 @@
 import asyncio
 from pyscript import document
 from pyodide.ffi import to_js, create_proxy
+import pyodide.http
 import json
 import time
 import traceback
 from datetime import datetime
+from urllib.parse import urlencode
 import js
 
 # Локальный кэш для данных, полученных из main.py
@@ -18,6 +20,8 @@ except ImportError:
 
 # Глобальная переменная для хранения экземпляра графика, чтобы его можно было обновлять или уничтожать
 current_chart = None
+# Сколько точек графика просить у сервера (он прореживает длинные периоды, сохраняя пики)
+CHART_POINTS = 500
 def set_external_historical_data(data):
     global grafik_local_cache
     grafik_local_cache = data
@@ -50,32 +54,33 @@ def parse_input_date(date_str):
 
 
 
-async def handle_update_chart_button_click(event=None):
-    global current_chart, grafik_local_cache
-
-    metal_select_element = document.querySelector("#chart-metal-select")
-    date_start_input = document.querySelector("#chart-date-start")
-    date_end_input = document.querySelector("#chart-date-end")
-
-    if not (metal_select_element and date_start_input and date_end_input):
-        display_chart_error("Не удалось найти элементы управления фильтрами графика.")
-        return
-
-    selected_metal = metal_select_element.value
-    date_start_str = date_start_input.value
-    date_end_str = date_end_input.value
-    
-
+async def fetch_chart_series(metal, date_start_str, date_end_str):
+    """(подписи, цены) с /api/chart - не больше CHART_POINTS точек; None, если сервер не ответил"""
+    params = {'metal': metal, 'points': CHART_POINTS}
+    if date_start_str:
+        params['from'] = date_start_str
+    if date_end_str:
+        params['to'] = date_end_str
+    try:
+        resp = await pyodide.http.pyfetch(f'/api/chart?{urlencode(params)}')
+        if not resp.ok:
+            return None
+        data = await resp.json()
+        series = data.get('data', {}).get(metal)
+        if series is None:
+            return None
+        return series['dates'], series['prices']
+    except Exception as e:
+        print(f"Ошибка при получении данных графика: {e}")
+        return None
 
-    if not grafik_local_cache:
-        display_chart_error("Исторические данные для графика еще не загружены ")
-        return
 
-    metal_historical_data = grafik_local_cache.get(selected_metal)
+def filter_local_series(metal, date_start_str, date_end_str):
+    """(подписи, цены) за период из загруженной истории, все точки; None, если истории металла нет"""
+    metal_historical_data = grafik_local_cache.get(metal)
     
     if not metal_historical_data:
-        display_chart_error(f"Нет исторических данных для металла")
-        return
+        return None
 
     date_start_obj = parse_input_date(date_start_str)
     date_end_obj = parse_input_date(date_end_str)
@@ -99,9 +104,41 @@ async def handle_update_chart_button_click(event=None):
                 price_str_cleaned = str(entry_price_str).replace(',', '.')
                 price = float(price_str_cleaned)
                 filtered_entries.append({"date": entry_date_obj, "price": price, "date_str": entry_date_str})
-                
+
+    filtered_entries.sort(key=lambda x: x["date"])
+    return [entry["date_str"] for entry in filtered_entries], [entry["price"] for entry in filtered_entries]
+
+
+async def handle_update_chart_button_click(event=None):
+    global current_chart, grafik_local_cache
+
+    metal_select_element = document.querySelector("#chart-metal-select")
+    date_start_input = document.querySelector("#chart-date-start")
+    date_end_input = document.querySelector("#chart-date-end")
+
+    if not (metal_select_element and date_start_input and date_end_input):
+        display_chart_error("Не удалось найти элементы управления фильтрами графика.")
+        return
+
+    selected_metal = metal_select_element.value
+    date_start_str = date_start_input.value
+    date_end_str = date_end_input.value
     
-    if not filtered_entries:
+
+
+    # Прореженный ряд с сервера; если сервер недоступен - все точки из загруженной истории
+    chart_series = await fetch_chart_series(selected_metal, date_start_str, date_end_str)
+    if chart_series is None:
+        if not grafik_local_cache:
+            display_chart_error("Исторические данные для графика еще не загружены ")
+            return
+        chart_series = filter_local_series(selected_metal, date_start_str, date_end_str)
+        if chart_series is None:
+            display_chart_error(f"Нет исторических данных для металла")
+            return
+    labels, data_points = chart_series
+
+    if not data_points:
         display_chart_error(f"Нет данных для графика для металла")
         
         # Очистим график, если он был, и данных нет
@@ -116,11 +153,6 @@ async def handle_update_chart_button_click(event=None):
              ctx.clearRect(0, 0, canvas_el_js.width, canvas_el_js.height)
         return
 
-    filtered_entries.sort(key=lambda x: x["date"])
-
-    labels = [entry["date_str"] for entry in filtered_entries]
-    data_points = [entry["price"] for entry in filtered_entries]
-
     chart_data_config = {
         'type': 'line',
         'data': {
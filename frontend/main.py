@@ -125,13 +125,11 @@ async def fetch_last_60_prices(metal_ru):
     metal = metal_map.get(metal_ru, 'gold')
 
     try:
-        resp = await pyodide.http.pyfetch('/api/historical_metals')
+        # Бэкенд сам отдает последние 60 дней одного металла, отсортированные по дате
+        resp = await pyodide.http.pyfetch(f'/api/historical_metals?metal={metal}&last=60')
         data = await resp.json()
         hist = data.get('data', {})
-        metal_hist = hist.get(metal_ru, [])
-
-        metal_hist_sorted = sorted(metal_hist, key=lambda x: x['date'])
-        last_60 = metal_hist_sorted[-60:] if len(metal_hist_sorted) >= 60 else metal_hist_sorted
+        last_60 = hist.get(metal_ru, [])
         prices = [float(x['price']) for x in last_60 if x['price'] != 'N/A']
         if len(prices) < 60:
             return None, None
@@ -141,16 +139,16 @@ async def fetch_last_60_prices(metal_ru):
         print(f"Ошибка при получении исторических данных: {e}")
         return None, None
 
-async def get_ai_forecast(metal, prices):
-    url = 'http://localhost:8001/forecast'
+async def get_ai_forecasts(items):
+    """Один запрос к /forecast/batch для списка пар (металл, цены)"""
+    url = 'http://localhost:8001/forecast/batch'
     payload = {
-        'metal': metal,
-        'prices': ','.join(str(p) for p in prices)
+        'items': [{'metal': metal, 'prices': prices, 'horizon': 7} for metal, prices in items]
     }
     try:
         resp = await pyodide.http.pyfetch(url, method='POST', headers={'Content-Type': 'application/json'}, body=json.dumps(payload))
         data = await resp.json()
-        return data.get('forecast', [])
+        return [item.get('forecast', []) for item in data.get('forecasts', [])]
     except Exception as e:
         print(f"Ошибка AI API: {e}")
         return None
@@ -307,18 +305,23 @@ async def on_ai_forecast_btn_click(event=None):
         rec_div.className = 'recommendation'
         rec_div.innerHTML = '<b>Недостаточно данных для прогноза</b>'
         return
-    forecast = await get_ai_forecast(metal_en, prices)
     last_price = prices[-1] if prices else '—'
 
-
+    # Прогнозы выбранного и парного металла получаем одним запросом
+    items = [(metal_en, prices)]
     if metal_en == 'palladium':
         other_prices, _ = await fetch_last_60_prices('Платина')
-        other_forecast = await get_ai_forecast('platinum', other_prices)
-        if other_forecast and isinstance(other_forecast, list) and len(other_forecast) > 0:
-            forecast = other_forecast
+        if other_prices:
+            items.append(('platinum', other_prices))
     elif metal_en == 'platinum':
         other_prices, _ = await fetch_last_60_prices('Палладий')
-        other_forecast = await get_ai_forecast('palladium', other_prices)
+        if other_prices:
+            items.append(('palladium', other_prices))
+
+    forecasts = await get_ai_forecasts(items)
+    forecast = forecasts[0] if forecasts else None
+    if forecasts and len(forecasts) > 1:
+        other_forecast = forecasts[1]
         if other_forecast and isinstance(other_forecast, list) and len(other_forecast) > 0:
             forecast = other_forecast
 